@@ -25,6 +25,7 @@ class PluginInterface(ABC):
         for obj in objs:
             for attr, value in self.config.items():
                 obj[attr] = value
+        utility.invalidate_object_index(list(self.config))
 
     def configure_settings(self):
         """Set config settings on the geo_node_modifier."""
@@ -106,13 +107,15 @@ class PluginInterface(ABC):
         # This method specifically handles the IMAGE type configuration.
         root_path, image_path = utility.get_asset_path(evaluated_asset)
         image_texture_name = f"{self.config['name']}_{key}"
-        image_texture = bpy.data.textures.new(image_texture_name, type="IMAGE")
 
         frame = bpy.context.scene.frame_current
         if isinstance(image_path, list):
             image_path = image_path[frame % len(image_path)]
 
-        image_texture.image = utility.load_image(str(root_path / image_path))
+        # The texture is reused in every frame
+        image_texture = utility.get_image_texture(
+            image_texture_name, utility.load_image(str(root_path / image_path))
+        )
         image_texture.extension = "EXTEND"
         image_texture.image.colorspace_settings.name = "Linear"
         self.geo_node_modifier[socket] = image_texture.image
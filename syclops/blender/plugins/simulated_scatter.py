@@ -29,17 +29,27 @@ class SimulatedScatter(PluginInterface):
 
     def _simulate_convex_objects(self, scatter_points: np.array):
         obj_poses = {}
-        with utility.RevertAfter():
+        # The rigid body world can not be removed by a snapshot
+        with utility.RevertAfter("undo"):
             bpy.ops.rigidbody.world_add()
             collection_rigidbody = bpy.data.collections.new("Rigidbody")
             bpy.data.scenes["Scene"].rigidbody_world.collection = collection_rigidbody
+            # Look up the convex hulls once, every scatter point adds new objects
+            conv_hulls_by_parent = {}
+            for conv_hull_instance in self.conv_hull_instances:
+                parent_uuid = conv_hull_instance.get()["PARENT_UUID"]
+                if parent_uuid not in conv_hulls_by_parent:
+                    conv_hulls_by_parent[parent_uuid] = utility.filter_objects(
+                        "PARENT_UUID", parent_uuid
+                    )
+            conv_hull_collection = self.conv_hull_instances_collection.get()
             for scatter_point in scatter_points:
                 new_conv_hulls = []
                 # Select random convex hull
                 parent_uuid = np.random.choice(self.conv_hull_instances).get()[
                     "PARENT_UUID"
                 ]
-                conv_hulls = utility.filter_objects("PARENT_UUID", parent_uuid)
+                conv_hulls = conv_hulls_by_parent[parent_uuid]
                 random_rotation = Vector(np.random.uniform(0, 2 * np.pi, size=3))
                 random_scale_value = (
                     np.random.normal(1, self.config["scale_std"])
@@ -53,9 +63,7 @@ class SimulatedScatter(PluginInterface):
                     new_conv_hull.location = scatter_point
                     new_conv_hull.rotation_euler = random_rotation
                     new_conv_hull.scale = random_scale
-                    self.conv_hull_instances_collection.get().objects.link(
-                        new_conv_hull
-                    )
+                    conv_hull_collection.objects.link(new_conv_hull)
                     new_conv_hull["PARENT_UUID_COPY"] = conv_hull["PARENT_UUID"]
                     del new_conv_hull["UUID"]
                     del new_conv_hull["PARENT_UUID"]
@@ -147,6 +155,7 @@ class SimulatedScatter(PluginInterface):
         self.conv_hull_instances = []
         bpy.data.collections.remove(self.conv_hull_instances_collection.get())
         self.conv_hull_instances_collection = None
+        utility.invalidate_object_index()
 
     def _create_base_object(self):
         """Add placeholder object to assign GeoNode Modifier to"""
@@ -1,7 +1,7 @@
 """Define the Scene class to setup virtual environment for rendering."""
 
 import logging
-import pickle
+import time
 from pathlib import Path
 
 import bpy
@@ -31,14 +31,8 @@ class Scene(object):
         self.catalog = catalog
 
         # Write dicts to scene as string of bytes
-        catalog_bytes = str(pickle.dumps(catalog), encoding="latin1")
-        bpy.data.scenes["Scene"]["catalog"] = catalog_bytes
-
-        job_bytes = str(
-            pickle.dumps(job_description),
-            encoding="latin1",
-        )
-        bpy.data.scenes["Scene"]["job_description"] = job_bytes
+        utility.set_scene_dict("catalog", catalog)
+        utility.set_scene_dict("job_description", job_description)
 
         self.output_path = Path(bpy.context.scene.render.filepath)
         self.configure_logging()
@@ -50,6 +44,28 @@ class Scene(object):
         with open(class_id_mapping_path, "w") as file:
             yaml.dump(class_id_mapping, file)
 
+        # Convert and write the sensor outputs in background processes
+        writer_settings = job_description.get("output_writer", {})
+        utility.configure_output_writer(
+            writer_settings.get("workers", utility.DEFAULT_OUTPUT_WRITER_WORKERS),
+            writer_settings.get("max_backlog", utility.DEFAULT_MAX_BACKLOG),
+        )
+
+        # Enumerate the render hardware once instead of for every output
+        utility.configure_render_devices()
+
+        # Keep the Cycles render data between renders and only sync what changed
+        persistent_data = job_description.get("persistent_data", False)
+        revert_mode = job_description.get("revert_mode", utility.DEFAULT_REVERT_MODE)
+        if persistent_data and revert_mode != "snapshot":
+            # Restoring an undo step replaces the scene data and discards the render data
+            raise ValueError("persistent_data requires revert_mode: snapshot")
+        bpy.context.scene.render.use_persistent_data = persistent_data
+        self.render_timer = None
+        if job_description.get("render_timing", False):
+            self.render_timer = utility.RenderTimer()
+            self.render_timer.register()
+
         self.tf_tree = Transformations()
         self.tf_tree.create_tf_tree(job_description["transformations"])
 
@@ -68,16 +84,76 @@ class Scene(object):
                 SEPARATOR * SEPARATOR_LENGTH,
             ),
         )
-        for step in range(self.job_description["steps"]):
-            logging.info("Step: {0}".format(step))
-            bpy.context.scene.frame_set(step)
-            self.tf_tree.configure_tf_tree()
-
-            for plugin_instance in self.plugin_instances:
-                plugin_instance.configure()
-            for sensor_instance in self.sensor_instances:
-                with utility.RevertAfter():
-                    sensor_instance.render_outputs()
+        try:
+            for step in range(self.job_description["steps"]):
+                logging.info("Step: {0}".format(step))
+                configure_start = time.perf_counter()
+                bpy.context.scene.frame_set(step)
+                self.tf_tree.configure_tf_tree()
+
+                for plugin_instance in self.plugin_instances:
+                    plugin_instance.configure()
+                # Plugins may have added, removed or tagged objects
+                utility.invalidate_object_index()
+                logging.info(
+                    "Step %d configured in %.3f s",
+                    step,
+                    time.perf_counter() - configure_start,
+                )
+                self.manage_image_memory()
+                for sensor_instance in self.sensor_instances:
+                    # Changes of the outputs that are kept for the following steps
+                    sensor_instance.prepare_outputs()
+                    with utility.RevertAfter(sensor_instance.revert_mode()):
+                        sensor_instance.render_outputs()
+                self.collect_garbage(step)
+        finally:
+            # Wait for the outputs that are still being written
+            utility.close_output_writer()
+            if self.render_timer is not None:
+                self.render_timer.unregister()
+                logging.info("Render timing: %s", self.render_timer.summary())
+
+    def manage_image_memory(self) -> None:
+        """Remove unused images above the memory budget and log the image memory."""
+        memory_budget = self.job_description.get("image_memory_budget")
+        if memory_budget is not None:
+            removed = utility.evict_images(memory_budget)
+            if removed:
+                logging.info("Removed %d unused images", removed)
+        memory, num_images = utility.image_memory()
+        logging.info(
+            "Resident image memory: %.1f MB in %d images", memory / 1024**2, num_images
+        )
+
+    def collect_garbage(self, step: int) -> None:
+        """Purge datablocks without users every N steps and log the memory usage.
+
+        If the resident memory exceeds the memory ceiling, unused datablocks of all
+        types are purged, regardless of the interval.
+
+        Args:
+            step: Current step.
+        """
+        gc_settings = self.job_description.get("garbage_collection")
+        telemetry = utility.memory_telemetry()
+        if gc_settings is not None:
+            ceiling = gc_settings.get("memory_ceiling")
+            above_ceiling = (
+                ceiling is not None
+                and telemetry["rss_mb"] is not None
+                and telemetry["rss_mb"] > ceiling
+            )
+            interval = gc_settings.get("interval", utility.DEFAULT_GC_INTERVAL)
+            if above_ceiling or (step + 1) % interval == 0:
+                removed = utility.collect_garbage(aggressive=above_ceiling)
+                logging.info(
+                    "Garbage collection removed %d datablocks%s",
+                    removed,
+                    " above the memory ceiling" if above_ceiling else "",
+                )
+                telemetry = utility.memory_telemetry()
+        logging.info("Memory after step %d: %s", step, telemetry)
 
     def configure_logging(self) -> None:
         """Set up logging to a file and to the console."""
@@ -19,6 +19,7 @@ META_DESCRIPTION = {
 
 
 class Keypoints(OutputInterface):
+    snapshot_revert = True
 
     def generate_output(self, parent_class: object):
         """Calculate the 3D keypoint positions and transform to camera space."""
@@ -28,6 +29,7 @@ class Keypoints(OutputInterface):
             self.check_debug_breakpoint()
             
             obj_dict = {}
+            instances = []
             depsgraph = bpy.context.view_layer.depsgraph
             scene = bpy.context.scene
             camera = scene.camera
@@ -54,7 +56,7 @@ class Keypoints(OutputInterface):
                         if "keypoints" in object_instance.object:
                             location = object_instance.matrix_world.translation
                             location = [round(x, 4) for x in location]
-                            instance_id = self._calculate_instance_id(location)
+                            keypoints = {}
                             for keypoint, pos in object_instance.object["keypoints"].items():
                                 vec = mathutils.Vector((pos['x'], pos['y'], pos['z']))
                                 vec = object_instance.matrix_world @ vec
@@ -66,13 +68,21 @@ class Keypoints(OutputInterface):
                                 if pixel_x < 0 or pixel_y < 0 or pixel_x > width or pixel_y > height:
                                     continue
                                 
-                                # Add to obj_dict
-                                if instance_id not in obj_dict:
-                                    obj_dict[instance_id] = {"class_id": class_id}
-                                obj_dict[instance_id][keypoint] = {
+                                keypoints[keypoint] = {
                                     "x": pixel_x,
                                     "y": pixel_y,
                                 }
+                            if keypoints:
+                                instances.append((location, class_id, keypoints))
+
+            # Hash all locations at once and add to obj_dict
+            instance_ids = self._calculate_instance_ids(
+                [location for location, _, _ in instances]
+            )
+            for instance_id, (_, class_id, keypoints) in zip(instance_ids, instances):
+                if instance_id not in obj_dict:
+                    obj_dict[instance_id] = {"class_id": class_id}
+                obj_dict[instance_id].update(keypoints)
 
             # Save output
             output_path = self._prepare_output_folder(parent_class.config["name"])
@@ -99,7 +109,7 @@ class Keypoints(OutputInterface):
         """Write the metadata output to a YAML file."""
         output_path = file.parent
 
-        with utility.AtomicYAMLWriter(str(output_path / "metadata.yaml")) as writer:
+        with utility.StepJournalWriter(str(output_path / "metadata.jsonl")) as writer:
             writer.data.update(META_DESCRIPTION)
             writer.add_step(
                 step=bpy.context.scene.frame_current,
@@ -113,18 +123,19 @@ class Keypoints(OutputInterface):
             writer.data["expected_steps"] = utility.get_job_conf()["steps"]
             writer.data["sensor"] = sensor_name
             writer.data["id"] = self.config["id"]
+            writer.data["instance_id_hash"] = utility.get_instance_id_hash()
 
     @staticmethod
-    def _calculate_instance_id(location: List[float]) -> int:
-        """Calculate the instance id from the location.
+    def _calculate_instance_ids(locations: List[List[float]]) -> List[int]:
+        """Calculate the instance ids from the locations.
 
         Args:
-            location: The location.
+            locations: The locations.
 
         Returns:
-            int: The instance id.
+            List[int]: The instance ids.
         """
         # Convert x, y, z to mm and round to integer
-        location = np.round(np.array(location) * 1000)
+        locations = np.round(np.array(locations, dtype=np.float64).reshape(-1, 3) * 1000)
 
-        return utility.hash_vector(location)
+        return utility.hash_vectors(locations, utility.get_instance_id_hash()).tolist()
@@ -17,6 +17,8 @@ META_DESCRIPTION = {
 class LaserDistanceOutput(OutputInterface):
     """Handles the generation of laser distance output for sensors."""
 
+    snapshot_revert = True
+
     def generate_output(self, parent_class: object):
         """Generate and save the laser ray distance output to JSON."""
         with utility.RevertAfter():
@@ -84,7 +86,7 @@ class LaserDistanceOutput(OutputInterface):
         """Write the metadata output to a YAML file."""
         output_path = file.parent
 
-        with utility.AtomicYAMLWriter(str(output_path / "metadata.yaml")) as writer:
+        with utility.StepJournalWriter(str(output_path / "metadata.jsonl")) as writer:
             writer.data.update(META_DESCRIPTION)
             writer.add_step(
                 step=bpy.context.scene.frame_current,
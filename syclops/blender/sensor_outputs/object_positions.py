@@ -18,12 +18,16 @@ meta_description_object_positions = {
 class ObjectPositions(OutputInterface):
     """Generate Camera RGB output"""
 
+    snapshot_revert = True
+
     def generate_output(self, parent_class: object = None):
         with utility.RevertAfter():
             # Depsgraph update
             bpy.context.view_layer.update()
             utility.refresh_modifiers()
             obj_dict = {}
+            pose_dicts = []
+            locations = []
             depsgraph = bpy.context.view_layer.depsgraph
             for object_instance in depsgraph.object_instances:
                 if object_instance.object.type == "MESH":
@@ -52,8 +56,9 @@ class ObjectPositions(OutputInterface):
                             "loc": location,
                             "rot": rotation,
                             "scl": scale,
-                            "id": self._calculate_instance_id(location),
                         }
+                        pose_dicts.append(pose_dict)
+                        locations.append(location)
                         if "keypoints" in object_instance.object:
                             pose_dict["keypoints"] = {}
                             for keypoint, pos in object_instance.object["keypoints"].items():
@@ -68,6 +73,11 @@ class ObjectPositions(OutputInterface):
                             obj_dict[class_id] = []
                         obj_dict[class_id].append(pose_dict)
 
+            # Hash all locations at once
+            instance_ids = self._calculate_instance_ids(locations)
+            for pose_dict, instance_id in zip(pose_dicts, instance_ids):
+                pose_dict["id"] = instance_id
+
             output_folder = utility.append_output_path("object_positions")
             utility.create_folder(output_folder)
 
@@ -81,26 +91,26 @@ class ObjectPositions(OutputInterface):
             logging.info("Wrote object positions to %s", json_file)
 
     @staticmethod
-    def _calculate_instance_id(location: List[float]) -> int:
-        """Calculate the instance id from the location.
+    def _calculate_instance_ids(locations: List[List[float]]) -> List[int]:
+        """Calculate the instance ids from the locations.
 
         Args:
-            location: The location.
+            locations: The locations.
 
         Returns:
-            int: The instance id.
+            List[int]: The instance ids.
         """
         # Convert x, y, z to mm and round to integer
-        location = np.round(np.array(location) * 1000)
+        locations = np.round(np.array(locations, dtype=np.float64).reshape(-1, 3) * 1000)
 
-        return utility.hash_vector(location)
+        return utility.hash_vectors(locations, utility.get_instance_id_hash()).tolist()
 
     def write_meta_output_file(self, file: Path):
         """Write the meta output file"""
         # Get the output folder
         output_path = file.parent
 
-        with utility.AtomicYAMLWriter(str(output_path / "metadata.yaml")) as writer:
+        with utility.StepJournalWriter(str(output_path / "metadata.jsonl")) as writer:
             # Add metadata
             writer.data.update(meta_description_object_positions)
             # Add current step
@@ -118,3 +128,4 @@ class ObjectPositions(OutputInterface):
             writer.data["expected_steps"] = utility.get_job_conf()["steps"]
             writer.data["sensor"] = bpy.context.scene.camera["name"]
             writer.data["id"] = self.config["id"]
+            writer.data["instance_id_hash"] = utility.get_instance_id_hash()
@@ -1,16 +1,23 @@
-import logging
 import os
 from abc import ABC, abstractmethod
+from pathlib import Path
 from typing import Callable
 
 import bpy
-import numpy as np
 from syclops import utility
 
+# Custom property of node groups whose object index dependency is removed for pixel annotations
+OBJECT_INDEX_FIX = "syclops_object_index_fix"
+# Label of the mix nodes that switch a material to its binary alpha
+ALPHA_SWITCH = "syclops_alpha_switch"
+
 
 class OutputInterface(ABC):
     """Abstract class for an output pass"""
 
+    # Whether all scene changes of the output are reverted by a utility.SceneSnapshot
+    snapshot_revert = False
+
     def __init__(self, config):
         self.config = config
 
@@ -23,13 +30,27 @@ class OutputInterface(ABC):
         """
         pass
 
+    def prepare(self):
+        """Set up persistent scene changes of the output before the sensor renders.
+
+        Called every step after the plugins are configured and outside of the
+        RevertAfter context of the sensor, so changes made here are kept for the
+        following steps. Does nothing by default.
+        """
+        pass
+
     @staticmethod
-    def process_alpha(mat, threshold=0.5):
+    def process_alpha(mat, threshold=0.5, switch_socket=None):
         """Get alpha nodes in material
 
         Args:
             mat (blender material): Material to process
             threshold (float, optional): Opacity threshold deciding if visible in pass. Defaults to 0.5.
+            switch_socket (bpy.types.NodeSocket, optional): Socket that is 1 while rendering the
+                pass and 0 otherwise. If given, the binary alpha only applies while the switch is
+                on, so the material can stay instrumented. A constant alpha is moved to a value
+                node labelled "Alpha", which stays editable. Switches that already exist are
+                reused. Defaults to None.
 
         Returns:
             alpha_node (dict): Alpha node
@@ -48,12 +69,32 @@ class OutputInterface(ABC):
                     while from_node.type == "REROUTE":
                         from_socket = from_node.inputs[0].links[0].from_socket
                         from_node = from_node.inputs[0].links[0].from_node
-                    alpha_nodes.append({"node": from_node, "socket": from_socket})
+                    if from_node.label != ALPHA_SWITCH:
+                        alpha_nodes.append({"node": from_node, "socket": from_socket})
+                    elif from_node.inputs["B"].links[0].from_node.type == "MATH":
+                        # Switched constant alpha, the original value is the off side
+                        value_node = from_node.inputs["A"].links[0].from_node
+                        alpha_is_zero = value_node.outputs[0].default_value <= threshold
+                    else:
+                        alpha_nodes.append(OutputInterface._switched_alpha(from_node))
                 # If no link, check if alpha is set to number
                 elif node.inputs["Alpha"].default_value < 1:
                     value = node.inputs["Alpha"].default_value
                     alpha_is_zero = value <= threshold
-                    node.inputs["Alpha"].default_value = value > threshold
+                    if switch_socket is None:
+                        node.inputs["Alpha"].default_value = value > threshold
+                    else:
+                        value_node = nt.nodes.new("ShaderNodeValue")
+                        value_node.label = "Alpha"
+                        value_node.outputs[0].default_value = value
+                        compare_node = nt.nodes.new("ShaderNodeMath")
+                        compare_node.operation = "GREATER_THAN"
+                        compare_node.inputs[1].default_value = threshold
+                        links.new(value_node.outputs[0], compare_node.inputs[0])
+                        binary_alpha = OutputInterface._switch_value(
+                            nt, switch_socket, value_node.outputs[0], compare_node.outputs[0]
+                        )
+                        links.new(binary_alpha, node.inputs["Alpha"])
 
         if len(alpha_nodes) == 0:
             for node in nt.nodes:
@@ -65,26 +106,18 @@ class OutputInterface(ABC):
                     if to_node.type == "MIX_SHADER":
                         # Fix Graswald object pass index dependency
                         from_node = to_node.inputs["Fac"].links[0].from_node
+                        if from_node.label == ALPHA_SWITCH:
+                            alpha_nodes.append(OutputInterface._switched_alpha(from_node))
+                            continue
                         if from_node.type == "GROUP":
                             if "Object Info" in from_node.node_tree.nodes:
-                                object_info_node = from_node.node_tree.nodes[
-                                    "Object Info"
-                                ]
-                                try:
-                                    object_info_to_node = (
-                                        object_info_node.outputs["Object Index"]
-                                        .links[0]
-                                        .to_node
-                                    )
-                                    # Remove link
-                                    from_node.node_tree.links.remove(
-                                        object_info_node.outputs["Object Index"].links[
-                                            0
-                                        ]
+                                if switch_socket is None:
+                                    OutputInterface.remove_object_index_link(
+                                        from_node.node_tree
                                     )
-                                    object_info_to_node.inputs[0].default_value = 0
-                                except:
-                                    pass
+                                else:
+                                    # Removed in remove_object_index_links while rendering the pass
+                                    from_node.node_tree[OBJECT_INDEX_FIX] = True
                         from_socket = to_node.inputs["Fac"].links[0].from_socket
                         alpha_nodes.append({"node": to_node, "socket": from_socket})
 
@@ -92,21 +125,90 @@ class OutputInterface(ABC):
             "Multiple alpha nodes found for material " + mat.name
         )  # Currently support only one alpha node per material
         alpha_node = alpha_nodes[0] if len(alpha_nodes) > 0 else None
-        # Make alpha binary with color ramp node
-        if alpha_node is not None:
+        # Make alpha binary with color ramp node, unless the material is already switched
+        if alpha_node is not None and not alpha_node.get("switched"):
             # New color ramp node
             color_ramp = nt.nodes.new("ShaderNodeValToRGB")
             # Link alpha to color ramp
             color_ramp.color_ramp.interpolation = "CONSTANT"
             color_ramp.color_ramp.elements[1].position = threshold
+            to_sockets = [link.to_socket for link in alpha_node["socket"].links]
+            binary_alpha = color_ramp.outputs["Color"]
+            if switch_socket is not None:
+                binary_alpha = OutputInterface._switch_value(
+                    nt, switch_socket, alpha_node["socket"], binary_alpha
+                )
             # Link alpha to outputs
-            for link in alpha_node["socket"].links:
-                links.new(color_ramp.outputs["Color"], link.to_socket)
+            for to_socket in to_sockets:
+                links.new(binary_alpha, to_socket)
             links.new(alpha_node["socket"], color_ramp.inputs[0])
             # Add to list of binary alpha nodes
             alpha_node = {"node": color_ramp, "socket": color_ramp.outputs["Color"]}
         return alpha_node, alpha_is_zero
 
+    @staticmethod
+    def _switched_alpha(switch_node) -> dict:
+        """Binary alpha of a switch that was added by an earlier process_alpha call.
+
+        Args:
+            switch_node (bpy.types.Node): Mix node labelled ALPHA_SWITCH
+
+        Returns:
+            dict: Alpha node with the color ramp that is the on side of the switch
+        """
+        from_socket = switch_node.inputs["B"].links[0].from_socket
+        return {"node": from_socket.node, "socket": from_socket, "switched": True}
+
+    @staticmethod
+    def _switch_value(nt, switch_socket, off, on):
+        """Mix node that outputs off or on depending on the switch socket.
+
+        Args:
+            nt (bpy.types.NodeTree): Node tree of the material
+            switch_socket (bpy.types.NodeSocket): Switch of the pass
+            off (Union[float, bpy.types.NodeSocket]): Value while the switch is 0
+            on (Union[float, bpy.types.NodeSocket]): Value while the switch is 1
+
+        Returns:
+            bpy.types.NodeSocket: Output of the mix node
+        """
+        mix_node = nt.nodes.new("ShaderNodeMix")
+        mix_node.label = ALPHA_SWITCH
+        nt.links.new(switch_socket, mix_node.inputs["Factor"])
+        for name, value in (("A", off), ("B", on)):
+            if isinstance(value, bpy.types.NodeSocket):
+                nt.links.new(value, mix_node.inputs[name])
+            else:
+                mix_node.inputs[name].default_value = value
+        return mix_node.outputs[0]
+
+    @staticmethod
+    def remove_object_index_link(node_tree):
+        """Remove the object index dependency of a node group, e.g. of Graswald assets.
+
+        Args:
+            node_tree (bpy.types.NodeTree): Node group with an "Object Info" node
+        """
+        object_info_node = node_tree.nodes["Object Info"]
+        try:
+            object_info_to_node = (
+                object_info_node.outputs["Object Index"].links[0].to_node
+            )
+            utility.record_node_tree(node_tree)
+            utility.record_state(object_info_to_node.inputs[0], "default_value")
+            # Remove link
+            node_tree.links.remove(object_info_node.outputs["Object Index"].links[0])
+            object_info_to_node.inputs[0].default_value = 0
+        except:
+            pass
+
+    @staticmethod
+    def remove_object_index_links():
+        """Remove the object index dependency of all node groups marked by process_alpha."""
+        for node_group in bpy.data.node_groups:
+            if node_group.get(OBJECT_INDEX_FIX):
+                OutputInterface.remove_object_index_link(node_group)
+
     @staticmethod
     def add_aov(mat, aov_name, alpha_node, alpha_is_zero, aov_type="Value"):
         """Add AOV to material"""
@@ -145,25 +247,44 @@ class OutputInterface(ABC):
             return None
 
     @staticmethod
-    def exr_to_npy(file: str, conversion_function: Callable = None) -> str:
-        """Convert exr to npy"""
+    def exr_to_npy(
+        file: str,
+        conversion_function: Callable = None,
+        array_format: str = utility.DEFAULT_ARRAY_FORMAT,
+        compression_level: int = None,
+        journal_step: tuple = None,
+    ) -> str:
+        """Convert exr to npy
+
+        If an output writer is configured, the conversion runs in a writer process
+        and the array file is written after this method returned.
+
+        Args:
+            file (str): Path to the exr file
+            conversion_function (Callable, optional): Function applied to the image. Defaults to None.
+            array_format (str, optional): "npz_compressed", "npz_stored", "npy", "zstd" or "lz4".
+                Defaults to "npz_compressed".
+            compression_level (int, optional): Level of the zstd or lz4 codec. Defaults to None.
+            journal_step (tuple, optional): Arguments of utility.write_journal_step to record
+                the array file in the metadata once it is written. Defaults to None.
+
+        Returns:
+            str: Path to the array file
+        """
+        array_file = str(Path(file).with_suffix(utility.ARRAY_FORMATS[array_format]))
         if file.endswith(".exr"):
-            img = utility.load_img_as_array(file)
-            # Remove alpha
-            img = img[:, :, :3]
-            # Check if channels have equal values
-            if np.all(img[:, :, 0] == img[:, :, 1]) and np.all(
-                img[:, :, 0] == img[:, :, 2]
-            ):
-                img = img[:, :, 0]  # Convert to single channel
-
-            if conversion_function is not None:
-                img = conversion_function(img, file)
-            # Save as numpy array
-            np.savez_compressed(file.replace(".exr", ".npz"), array=img)
+            writer = utility.get_output_writer()
+            # Images sent to a writer process can not share the reused buffer
+            img = utility.load_img_as_array(file, reuse_buffer=writer is None)
             os.remove(file)
-            logging.info("Converted %s to numpy array", file)
-        return file.replace(".exr", ".npz")
+            args = (img, file, conversion_function, array_format, compression_level, journal_step)
+            if writer is None:
+                array_file = utility.write_array_output(*args)
+            else:
+                writer.submit(utility.write_array_output, *args)
+        elif journal_step is not None:
+            utility.write_journal_step(*journal_step)
+        return array_file
 
     def compositor(self):
         """Add nodes to compositor"""
@@ -1,5 +1,6 @@
 import logging
 import os
+from functools import partial
 from pathlib import Path
 
 import bpy
@@ -38,56 +39,74 @@ meta_description_object_volume = {
     "description": "Each pixel contains the volume of the object it belongs to. It is described in cm^3.",
 }
 
+# Custom property of materials that already contain the AOV outputs
+AOV_MARKER = "syclops_aovs"
+# Scene property read by the materials to apply the binary alpha of the annotation render
+ANNOTATION_SWITCH = "syclops_annotation"
 
 
-# Output postprocessing functions
-def postprocess_functions(img, file):
-    if "semantic_segmentation" in file:
-        img = np.round(img).astype(np.int32)
-
-    elif "instance_segmentation" in file:
-        try:
-            # Convert x, y, z to mm and round to integer
-            img_mm = np.round(img * 1000)
-
-            # Calculate unique x, y, z values and assign new index
-            values, index = np.unique(img_mm.reshape(-1, img_mm.shape[2]), axis=0, return_inverse=True)
-
-            # Hash the unique values to get the instance id
-            vectorized_hash = np.vectorize(utility.hash_vector, signature='(n)->()')
-            instance_id = vectorized_hash(values)
+class PixelAnnotation(OutputInterface):
+    """Generate pixel accurate ground truth output"""
 
-            # Create instance segmentation mask
-            img_mask = instance_id[index]
-            img = img_mask.reshape(img_mm.shape[0], img_mm.shape[1])
-            if values.shape[0] != instance_id.shape[0]:
-                logging.warning("Hashing of instance ids created collisions")
-        except IndexError:
-            logging.warning("Instance segmentation mask is empty")
-            img = np.zeros(img.shape[:2], dtype=np.int32)
-    elif "object_volume" in file:
-        img = np.trunc(img * 10**3) / (10**3)
-    return img
+    snapshot_revert = True
 
+    def prepare(self):
+        """Add the AOV outputs to all materials that are not instrumented yet.
 
-class PixelAnnotation(OutputInterface):
-    """Generate pixel accurate ground truth output"""
+        The AOV nodes stay in the materials, so only new materials are instrumented in
+        later steps. Their alpha changes only apply while the annotation switch is on.
+        """
+        new_materials = [
+            mat
+            for mat in bpy.data.materials
+            if mat.use_nodes and not mat.get(AOV_MARKER)
+        ]
+        for mat in new_materials:
+            self.instrument_material(mat)
+        if new_materials:
+            logging.info("Added pixel annotation AOVs to %d materials", len(new_materials))
 
     def generate_output(self, parent_class: object = None):
+        if self.pointcloud_derived() and "depth" not in self.config:
+            raise ValueError("A derived pointcloud requires the depth output")
         with utility.RevertAfter():
-            self.configure_semantic_seg()
-            self.configure_instance_seg()
-            self.configure_depth()
-            self.configure_pointcloud()
-            self.configure_object_volume()
+            self.set_object_class_ids()
+            self.remove_object_index_links()
             self.render_configuration()
 
+    def pointcloud_derived(self) -> bool:
+        """Whether the pointcloud is derived from the depth output instead of being rendered."""
+        return self.config.get("pointcloud", {}).get("mode", "rendered") == "derived"
+
+    def instrument_material(self, mat):
+        """Add the AOV outputs of all passes to a material.
+
+        Args:
+            mat (bpy.types.Material): Material with nodes
+        """
+        switch = mat.node_tree.nodes.new("ShaderNodeAttribute")
+        switch.name = ANNOTATION_SWITCH
+        switch.attribute_type = "VIEW_LAYER"
+        switch.attribute_name = ANNOTATION_SWITCH
+        alpha_node, alpha_is_zero = self.process_alpha(
+            mat, switch_socket=switch.outputs["Fac"]
+        )
+        self.configure_semantic_seg(mat, alpha_node, alpha_is_zero)
+        self.configure_instance_seg(mat, alpha_node, alpha_is_zero)
+        self.configure_depth(mat, alpha_node, alpha_is_zero)
+        # A derived pointcloud is computed from the depth after rendering
+        if not self.pointcloud_derived():
+            self.configure_pointcloud(mat, alpha_node, alpha_is_zero)
+        self.configure_object_volume(mat, alpha_node, alpha_is_zero)
+        mat[AOV_MARKER] = True
+
     @staticmethod
     def set_object_class_ids():
         """Set the class id for each object in the scene."""
         for obj in bpy.data.objects:
             class_id = obj.get("class_id")
             if class_id is not None:
+                utility.record_state(obj, "pass_index")
                 obj.pass_index = class_id
 
             class_id_offset = obj.get("class_id_offset")
@@ -97,117 +116,97 @@ class PixelAnnotation(OutputInterface):
                         # Strip of the .001, .002, etc. from the material name
                         # Name can have multiple dots, so we only strip the last one
                         if mat.name.rsplit(".", 1)[0] == material_name:
-                            offset_node = mat.node_tree.nodes.new("ShaderNodeValue")
-                            offset_node.name = "class_id_offset"
-                            offset_node.outputs[0].default_value = offset
+                            if "class_id_offset" in mat.node_tree.nodes:
+                                offset_node = mat.node_tree.nodes["class_id_offset"]
+                                utility.record_state(offset_node.outputs[0], "default_value")
+                                offset_node.outputs[0].default_value = offset
 
-    def configure_semantic_seg(self):
+    def configure_semantic_seg(self, mat, alpha_node, alpha_is_zero):
         """Configure the semantic segmentation pass."""
-        self.set_object_class_ids()
-        for mat in bpy.data.materials:
-            if mat.use_nodes:
-                alpha_node, alpha_is_zero = self.process_alpha(mat)
-                aov = self.add_aov(
-                    mat, "semantic_segmentation", alpha_node, alpha_is_zero
-                )
-                # Add object info node
-                obj_info = mat.node_tree.nodes.new("ShaderNodeObjectInfo")
-                # Link Object index to AOV
-                links = mat.node_tree.links
-
-                # If class_id_offset value node exists, link it a new math node to add the offset
-                if "class_id_offset" in mat.node_tree.nodes:
-                    class_id_offset = mat.node_tree.nodes["class_id_offset"]
-                    math_node = mat.node_tree.nodes.new("ShaderNodeMath")
-                    math_node.operation = "ADD"
-                    links.new(class_id_offset.outputs["Value"], math_node.inputs[0])
-                    links.new(obj_info.outputs["Object Index"], math_node.inputs[1])
-                    links.new(math_node.outputs["Value"], aov.inputs[1])
-                else:
-                    links.new(obj_info.outputs["Object Index"], aov.inputs[1])
-
-    def configure_instance_seg(self):
+        aov = self.add_aov(mat, "semantic_segmentation", alpha_node, alpha_is_zero)
+        # Add object info node
+        obj_info = mat.node_tree.nodes.new("ShaderNodeObjectInfo")
+        # Offset of the class id, set by set_object_class_ids while rendering
+        class_id_offset = mat.node_tree.nodes.new("ShaderNodeValue")
+        class_id_offset.name = "class_id_offset"
+        class_id_offset.outputs[0].default_value = 0
+        # Link the object index plus the offset to the AOV
+        links = mat.node_tree.links
+        math_node = mat.node_tree.nodes.new("ShaderNodeMath")
+        math_node.operation = "ADD"
+        links.new(class_id_offset.outputs["Value"], math_node.inputs[0])
+        links.new(obj_info.outputs["Object Index"], math_node.inputs[1])
+        links.new(math_node.outputs["Value"], aov.inputs[1])
+
+    def configure_instance_seg(self, mat, alpha_node, alpha_is_zero):
         """Configure the instance segmentation pass"""
-        for mat in bpy.data.materials:
-            if mat.use_nodes:
-                alpha_node, alpha_is_zero = self.process_alpha(mat)
-                aov = self.add_aov(
-                    mat, "instance_segmentation", alpha_node, alpha_is_zero, "Color"
-                )
-
-                # Add object info node
-                obj_info = mat.node_tree.nodes.new("ShaderNodeObjectInfo")
-                # Link Object Location to AOV
-                links = mat.node_tree.links
-                links.new(obj_info.outputs["Location"], aov.inputs[1])
-
-    def configure_depth(self):
+        aov = self.add_aov(
+            mat, "instance_segmentation", alpha_node, alpha_is_zero, "Color"
+        )
+
+        # Add object info node
+        obj_info = mat.node_tree.nodes.new("ShaderNodeObjectInfo")
+        # Link Object Location to AOV
+        links = mat.node_tree.links
+        links.new(obj_info.outputs["Location"], aov.inputs[1])
+
+    def configure_depth(self, mat, alpha_node, alpha_is_zero):
         """Configure the depth pass"""
-        for mat in bpy.data.materials:
-            if mat.use_nodes:
-                alpha_node, alpha_is_zero = self.process_alpha(mat)
-                aov = self.add_aov(mat, "depth", alpha_node, alpha_is_zero)
-                # Add object info node
-                cam_data = mat.node_tree.nodes.new("ShaderNodeCameraData")
-                # Link Object index to AOV
-                links = mat.node_tree.links
-                links.new(cam_data.outputs["View Z Depth"], aov.inputs[1])
-
-    def configure_pointcloud(self):
+        aov = self.add_aov(mat, "depth", alpha_node, alpha_is_zero)
+        # Add object info node
+        cam_data = mat.node_tree.nodes.new("ShaderNodeCameraData")
+        # Link Object index to AOV
+        links = mat.node_tree.links
+        links.new(cam_data.outputs["View Z Depth"], aov.inputs[1])
+
+    def configure_pointcloud(self, mat, alpha_node, alpha_is_zero):
         """Configure a pointcloud pass"""
-        for mat in bpy.data.materials:
-            if mat.use_nodes:
-                alpha_node, alpha_is_zero = self.process_alpha(mat)
-                aov = self.add_aov(
-                    mat, "pointcloud", alpha_node, alpha_is_zero, "Color"
-                )
-                # Add geometry node
-                geom_node = mat.node_tree.nodes.new("ShaderNodeNewGeometry")
-                # Add vector transform node
-                transform_node = mat.node_tree.nodes.new("ShaderNodeVectorTransform")
-                transform_node.vector_type = "POINT"
-                transform_node.convert_to = "CAMERA"
-                # Link nodes
-                links = mat.node_tree.links
-                links.new(geom_node.outputs["Position"], transform_node.inputs[0])
-                links.new(transform_node.outputs["Vector"], aov.inputs[1])
-
-    def configure_object_volume(self):
+        aov = self.add_aov(mat, "pointcloud", alpha_node, alpha_is_zero, "Color")
+        # Add geometry node
+        geom_node = mat.node_tree.nodes.new("ShaderNodeNewGeometry")
+        # Add vector transform node
+        transform_node = mat.node_tree.nodes.new("ShaderNodeVectorTransform")
+        transform_node.vector_type = "POINT"
+        transform_node.convert_to = "CAMERA"
+        # Link nodes
+        links = mat.node_tree.links
+        links.new(geom_node.outputs["Position"], transform_node.inputs[0])
+        links.new(transform_node.outputs["Vector"], aov.inputs[1])
+
+    def configure_object_volume(self, mat, alpha_node, alpha_is_zero):
         """Configure the object volume pass"""
-        for mat in bpy.data.materials:
-            if mat.use_nodes:
-                alpha_node, alpha_is_zero = self.process_alpha(mat)
-                aov = self.add_aov(mat, "object_volume", alpha_node, alpha_is_zero)
-                # Add Attribute Nodes
-                vol_attribute = mat.node_tree.nodes.new("ShaderNodeAttribute")
-                vol_attribute.attribute_name = "volume"
-                scale_attribute = mat.node_tree.nodes.new("ShaderNodeAttribute")
-                scale_attribute.attribute_type = "INSTANCER"
-                scale_attribute.attribute_name = "instance_scale"
-                # Add Math Nodes
-                compare_node = mat.node_tree.nodes.new("ShaderNodeMath")
-                compare_node.operation = "COMPARE"
-                compare_node.inputs[1].default_value = 0.0
-                compare_node.inputs[2].default_value = 0.00001
-                multiply_node = mat.node_tree.nodes.new("ShaderNodeMath")
-                multiply_node.operation = "MULTIPLY"
-                mix_node = mat.node_tree.nodes.new("ShaderNodeMix")
-                # Link Object index to AOV
-                links = mat.node_tree.links
-                links.new(vol_attribute.outputs["Fac"], mix_node.inputs["B"])
-                links.new(vol_attribute.outputs["Fac"], multiply_node.inputs[0])
-                links.new(scale_attribute.outputs["Fac"], multiply_node.inputs[1])
-                links.new(multiply_node.outputs[0], mix_node.inputs["A"])
-                links.new(compare_node.outputs[0], mix_node.inputs["Factor"])
-                links.new(scale_attribute.outputs["Fac"], compare_node.inputs[0])
-                links.new(mix_node.outputs[0], aov.inputs[1])
+        aov = self.add_aov(mat, "object_volume", alpha_node, alpha_is_zero)
+        # Add Attribute Nodes
+        vol_attribute = mat.node_tree.nodes.new("ShaderNodeAttribute")
+        vol_attribute.attribute_name = "volume"
+        scale_attribute = mat.node_tree.nodes.new("ShaderNodeAttribute")
+        scale_attribute.attribute_type = "INSTANCER"
+        scale_attribute.attribute_name = "instance_scale"
+        # Add Math Nodes
+        compare_node = mat.node_tree.nodes.new("ShaderNodeMath")
+        compare_node.operation = "COMPARE"
+        compare_node.inputs[1].default_value = 0.0
+        compare_node.inputs[2].default_value = 0.00001
+        multiply_node = mat.node_tree.nodes.new("ShaderNodeMath")
+        multiply_node.operation = "MULTIPLY"
+        mix_node = mat.node_tree.nodes.new("ShaderNodeMix")
+        # Link Object index to AOV
+        links = mat.node_tree.links
+        links.new(vol_attribute.outputs["Fac"], mix_node.inputs["B"])
+        links.new(vol_attribute.outputs["Fac"], multiply_node.inputs[0])
+        links.new(scale_attribute.outputs["Fac"], multiply_node.inputs[1])
+        links.new(multiply_node.outputs[0], mix_node.inputs["A"])
+        links.new(compare_node.outputs[0], mix_node.inputs["Factor"])
+        links.new(scale_attribute.outputs["Fac"], compare_node.inputs[0])
+        links.new(mix_node.outputs[0], aov.inputs[1])
 
     def render_configuration(self):
         """Setup all render settings for the output"""
         utility.configure_render()
+        utility.apply_render_settings({"cycles.use_denoising": False, "cycles.samples": 1})
         scene = bpy.context.scene
-        scene.cycles.use_denoising = False
-        scene.cycles.samples = 1
+        # Switch the instrumented materials to binary alpha
+        scene[ANNOTATION_SWITCH] = 1.0
 
         # Add AOV Outputs
         bpy.ops.scene.view_layer_add_aov()
@@ -222,10 +221,11 @@ class PixelAnnotation(OutputInterface):
         aov = bpy.context.scene.view_layers["ViewLayer"].active_aov
         aov.name = "depth"
         aov.type = "VALUE"
-        bpy.ops.scene.view_layer_add_aov()
-        aov = bpy.context.scene.view_layers["ViewLayer"].active_aov
-        aov.name = "pointcloud"
-        aov.type = "COLOR"
+        if not self.pointcloud_derived():
+            bpy.ops.scene.view_layer_add_aov()
+            aov = bpy.context.scene.view_layers["ViewLayer"].active_aov
+            aov.name = "pointcloud"
+            aov.type = "COLOR"
         bpy.ops.scene.view_layer_add_aov()
         aov = bpy.context.scene.view_layers["ViewLayer"].active_aov
         aov.name = "object_volume"
@@ -254,9 +254,10 @@ class PixelAnnotation(OutputInterface):
         output_files = self.configure_ground_truth_pass(
             output_node, "depth", output_files
         )
-        output_files = self.configure_ground_truth_pass(
-            output_node, "pointcloud", output_files
-        )
+        if not self.pointcloud_derived():
+            output_files = self.configure_ground_truth_pass(
+                output_node, "pointcloud", output_files
+            )
         output_files = self.configure_ground_truth_pass(
             output_node, "object_volume", output_files
         )
@@ -274,47 +275,96 @@ class PixelAnnotation(OutputInterface):
 
         for file in output_files:
             file_path = Path(output_node.base_path, file + ".exr")
-            new_file = self.exr_to_npy(str(file_path), postprocess_functions)
-            self.write_meta_output_file(Path(new_file))
+            gt_pass = file.split(os.sep)[0]
+            conversion_function = partial(
+                utility.convert_pixel_annotation,
+                hash_scheme=utility.get_instance_id_hash(),
+                compact=self.config[gt_pass].get("compact", False),
+                encoding=self.encoding(gt_pass),
+                class_id_dtype=self.class_id_dtype(),
+            )
+            array_format = self.config[gt_pass].get(
+                "format", utility.DEFAULT_ARRAY_FORMAT
+            )
+            array_file = file_path.with_suffix(utility.ARRAY_FORMATS[array_format])
+            # The metadata is written together with the array file, possibly by a writer process
+            self.exr_to_npy(
+                str(file_path),
+                conversion_function,
+                array_format,
+                self.config[gt_pass].get("compression_level"),
+                self.meta_output_step(array_file),
+            )
 
-    def write_meta_output_file(self, file: Path):
-        """Write the meta output file"""
+    def class_id_dtype(self) -> np.dtype:
+        """Smallest integer dtype that holds all class ids of the job and the background.
+
+        It is derived once, so compact semantic segmentations have the same dtype in every frame.
+        """
+        if not hasattr(self, "_class_id_dtype"):
+            class_ids = [0, *utility.find_class_id_mapping(utility.get_job_conf())]
+            self._class_id_dtype = utility.smallest_int_dtype(np.array(class_ids))
+        return self._class_id_dtype
+
+    def encoding(self, gt_pass: str):
+        """Quantized encoding of a pass, None if the values are stored as float32"""
+        config = self.config[gt_pass]
+        return utility.create_encoding(
+            config.get("encoding", "float32"),
+            config.get("precision", utility.DEFAULT_PRECISION),
+            config.get("offset", 0.0),
+        )
+
+    def meta_output_step(self, file: Path) -> tuple:
+        """Collect the metadata of an output file
+
+        Returns:
+            tuple: Arguments of utility.write_journal_step
+        """
         # Get the output folder
         output_path = Path(file).parent
 
-        with utility.AtomicYAMLWriter(str(output_path / "metadata.yaml")) as writer:
-            # Add metadata
-            curr_frame = bpy.context.scene.frame_current
-            if "semantic_segmentation" in str(file):
-                writer.data.update(meta_description_semantic)
-                type_name = "SEMANTIC_SEGMENTATION"
-                id_str = self.config["semantic_segmentation"]["id"]
-            elif "instance_segmentation" in str(file):
-                writer.data.update(meta_description_instance)
-                type_name = "INSTANCE_SEGMENTATION"
-                id_str = self.config["instance_segmentation"]["id"]
-            elif "depth" in str(file):
-                writer.data.update(meta_description_depth)
-                type_name = "DEPTH"
-                id_str = self.config["depth"]["id"]
-            elif "pointcloud" in str(file):
-                writer.data.update(meta_description_pointcloud)
-                type_name = "POINTCLOUD"
-                id_str = self.config["pointcloud"]["id"]
-            elif "object_volume" in str(file):
-                writer.data.update(meta_description_object_volume)
-                type_name = "VOLUME"
-                id_str = self.config["object_volume"]["id"]
-            # Add current step
-            writer.add_step(
-                step=curr_frame,
-                step_dicts=[{"type": type_name, "path": str(file.name)}],
-            )
-
-            # Add expected steps
-            writer.data["expected_steps"] = utility.get_job_conf()["steps"]
-            writer.data["sensor"] = bpy.context.scene.camera["name"]
-            writer.data["id"] = id_str
+        # Add metadata
+        header = {}
+        curr_frame = bpy.context.scene.frame_current
+        if "semantic_segmentation" in str(file):
+            header.update(meta_description_semantic)
+            type_name = "SEMANTIC_SEGMENTATION"
+            id_str = self.config["semantic_segmentation"]["id"]
+        elif "instance_segmentation" in str(file):
+            header.update(meta_description_instance)
+            type_name = "INSTANCE_SEGMENTATION"
+            id_str = self.config["instance_segmentation"]["id"]
+            header["instance_id_hash"] = utility.get_instance_id_hash()
+        elif "depth" in str(file):
+            header.update(meta_description_depth)
+            type_name = "DEPTH"
+            id_str = self.config["depth"]["id"]
+        elif "pointcloud" in str(file):
+            header.update(meta_description_pointcloud)
+            type_name = "POINTCLOUD"
+            id_str = self.config["pointcloud"]["id"]
+        elif "object_volume" in str(file):
+            header.update(meta_description_object_volume)
+            type_name = "VOLUME"
+            id_str = self.config["object_volume"]["id"]
+        header["format"] = utility.array_format_name(file)
+        # Decoding parameters of quantized values, the folder is named after the pass
+        encoding = self.encoding(file.parent.name)
+        if encoding is not None:
+            header["encoding"] = encoding
+
+        # Add expected steps
+        header["expected_steps"] = utility.get_job_conf()["steps"]
+        header["sensor"] = bpy.context.scene.camera["name"]
+        header["id"] = id_str
+        # Add current step
+        step_dicts = [{"type": type_name, "path": str(file.name)}]
+        if type_name == "INSTANCE_SEGMENTATION" and self.config["instance_segmentation"].get(
+            "compact", False
+        ):
+            step_dicts[0]["id_table"] = str(Path(utility.INSTANCE_ID_TABLE, file.name))
+        return (str(output_path / "metadata.jsonl"), header, curr_frame, step_dicts)
 
     def configure_ground_truth_pass(self, output_node, gt_pass, output_files):
         scene = bpy.context.scene
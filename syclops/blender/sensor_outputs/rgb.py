@@ -16,33 +16,32 @@ meta_description = {
 class RGB(OutputInterface):
     """Generate Camera RGB output"""
 
+    snapshot_revert = True
+
     def generate_output(self, parent_class: object = None):
         with utility.RevertAfter():
             utility.configure_render()
 
             job_description = utility.get_job_conf()
-            bpy.context.scene.cycles.use_denoising = job_description[
-                "denoising_enabled"
-            ]
-            try:
-                bpy.context.scene.cycles.denoiser = job_description[
-                    "denoising_algorithm"
+            settings = {
+                "cycles.use_denoising": job_description["denoising_enabled"],
+                "cycles.samples": self.config["samples"],
+                "render.image_settings.color_mode": "RGB",
+            }
+            if "image_compression" in job_description:
+                settings["render.image_settings.compression"] = job_description[
+                    "image_compression"
                 ]
+            utility.apply_render_settings(settings)
+            try:
+                utility.apply_render_settings(
+                    {"cycles.denoiser": job_description["denoising_algorithm"]}
+                )
             except TypeError as e:
                 logging.error(
                     f"Could not set denoiser to {job_description['denoising_algorithm']}. Try 'OPENIMAGEDENOISE'."
                 )
                 raise e
-            bpy.context.scene.cycles.samples = self.config["samples"]
-
-            if "image_compression" in job_description:
-                bpy.data.scenes[
-                    "Scene"
-                ].render.image_settings.compression = job_description[
-                    "image_compression"
-                ]
-
-            bpy.context.scene.render.image_settings.color_mode = "RGB"
 
             # Create subfolders
             cam_name = bpy.context.scene.camera["name"]
@@ -59,7 +58,7 @@ class RGB(OutputInterface):
             logging.info(f"Rendering RGB Image for sensor {cam_name}")
             bpy.ops.render.render(write_still=True)
 
-            with utility.AtomicYAMLWriter(str(output_path / "metadata.yaml")) as writer:
+            with utility.StepJournalWriter(str(output_path / "metadata.jsonl")) as writer:
                 # Add metadata
                 writer.data.update(meta_description)
                 # Add current step
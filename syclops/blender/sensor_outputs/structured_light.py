@@ -20,26 +20,25 @@ class StructuredLight(OutputInterface):
             utility.configure_render()
 
             job_description = utility.get_job_conf()
-            bpy.context.scene.cycles.use_denoising = job_description[
-                "denoising_enabled"
-            ]
-            try:
-                bpy.context.scene.cycles.denoiser = job_description[
-                    "denoising_algorithm"
+            settings = {
+                "cycles.use_denoising": job_description["denoising_enabled"],
+                "cycles.samples": self.config["samples"],
+                "render.image_settings.color_mode": "RGB",
+            }
+            if "image_compression" in job_description:
+                settings["render.image_settings.compression"] = job_description[
+                    "image_compression"
                 ]
+            utility.apply_render_settings(settings)
+            try:
+                utility.apply_render_settings(
+                    {"cycles.denoiser": job_description["denoising_algorithm"]}
+                )
             except TypeError as e:
                 logging.error(
                     f"Could not set denoiser to {job_description['denoising_algorithm']}. Try 'OPENIMAGEDENOISE'."
                 )
                 raise e
-            bpy.context.scene.cycles.samples = self.config["samples"]
-
-            if "image_compression" in job_description:
-                bpy.data.scenes["Scene"].render.image_settings.compression = (
-                    job_description["image_compression"]
-                )
-
-            bpy.context.scene.render.image_settings.color_mode = "RGB"
 
             # Get the camera
             cam_name = bpy.context.scene.camera["name"]
@@ -62,7 +61,7 @@ class StructuredLight(OutputInterface):
             logging.info(f"Rendering Structured Light for sensor {cam_name}")
             bpy.ops.render.render(write_still=True)
 
-            with utility.AtomicYAMLWriter(str(output_path / "metadata.yaml")) as writer:
+            with utility.StepJournalWriter(str(output_path / "metadata.jsonl")) as writer:
                 # Add metadata
                 writer.data.update(meta_description)
                 # Add current step
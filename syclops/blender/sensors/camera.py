@@ -14,6 +14,8 @@ from syclops.blender.sensors.sensor_interface import SensorInterface
 class Camera(SensorInterface):
     """Plugin creating a camera inside blender"""
 
+    snapshot_revert = True
+
     def setup_sensor(self):
         self.create_camera()  # Create self.objs
         for obj in self.objs:
@@ -154,6 +156,8 @@ class Camera(SensorInterface):
             if obj.get().type == "CAMERA":
                 cam = obj.get()
         scene.camera = cam
+        utility.record_state(cam.data, "lens", "sensor_width")
+        utility.record_state(cam.data.dof, "focus_distance")
 
         if cam.data.dof.use_dof:
             if self.config["depth_of_field"]["autofocus"]:
@@ -347,8 +351,8 @@ class Camera(SensorInterface):
         with open(calibration_file, "w") as f:
             yaml.dump({"camera_matrix": cam_matrix.tolist()}, f)
 
-        with utility.AtomicYAMLWriter(
-            str(calibration_folder / "metadata.yaml")
+        with utility.StepJournalWriter(
+            str(calibration_folder / "metadata.jsonl")
         ) as writer:
             # Add metadata
             writer.data.update(meta_description_intrinsics)
@@ -395,8 +399,8 @@ class Camera(SensorInterface):
             "description": "Writes the global pose of the camera.",
         }
 
-        with utility.AtomicYAMLWriter(
-            str(calibration_folder / "metadata.yaml")
+        with utility.StepJournalWriter(
+            str(calibration_folder / "metadata.jsonl")
         ) as writer:
             # Add metadata
             writer.data.update(meta_description_extrinsics)
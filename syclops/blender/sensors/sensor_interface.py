@@ -9,6 +9,9 @@ from syclops import utility
 class SensorInterface(ABC):
     """Abstract class for sensors"""
 
+    # Whether all scene changes of render_outputs are reverted by a utility.SceneSnapshot
+    snapshot_revert = False
+
     def __init__(self, config):
         self.config: dict = config
         self.objs: list[utility.ObjPointer] = []
@@ -33,6 +36,7 @@ class SensorInterface(ABC):
         for obj in objs:
             for attr, value in self.config.items():
                 obj[attr] = value
+        utility.invalidate_object_index(list(self.config))
 
     def setup_tf(self):
         """Check if plugin has a frame_id and if so, add relationship."""
@@ -49,6 +53,23 @@ class SensorInterface(ABC):
         else:
             logging.error("No frame_id specified for %s", self.config["name"])
 
+    def prepare_outputs(self):
+        """Let the outputs set up persistent scene changes before the sensor renders."""
+        for output in getattr(self, "outputs", []):
+            output.prepare()
+
+    def revert_mode(self):
+        """Mode of the RevertAfter context around render_outputs.
+
+        Returns:
+            str: "undo" if the sensor or one of its outputs does not support snapshots,
+                None to use the revert_mode of the job.
+        """
+        outputs = getattr(self, "outputs", [])
+        if not self.snapshot_revert or not all(o.snapshot_revert for o in outputs):
+            return "undo"
+        return None
+
     @abstractmethod
     def setup_sensor(self):
         """Setup the sensor"""
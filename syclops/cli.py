@@ -1,5 +1,6 @@
 import argparse
 import subprocess
+import tempfile
 import time
 from datetime import datetime
 from pathlib import Path
@@ -15,6 +16,8 @@ from syclops.utility import (
     get_or_create_install_folder,
     get_site_packages_path,
     get_module_path,
+    compact_journals,
+    StepEventBroker,
 )
 from syclops.asset_manager.asset_crawler import AssetCrawler
 import sys
@@ -103,6 +106,22 @@ parser.add_argument(
     action="store_true",
 )
 
+subparsers = parser.add_subparsers(dest="command")
+postprocess_parser = subparsers.add_parser(
+    "postprocess",
+    help="Run the postprocessing of a job description on a generated dataset, without rendering",
+)
+postprocess_parser.add_argument(
+    "--dataset",
+    help="Path of the generated dataset",
+    required=True,
+)
+postprocess_parser.add_argument(
+    "--config",
+    help="Path to the job description file with the postprocessing operations",
+    required=True,
+)
+
 
 def _run_subprocess(args, cwd=None, env=None, execution_info="Command"):
     process_result = subprocess.run(args, cwd=cwd, env=env)
@@ -280,24 +299,61 @@ def _run_syclops_job(args, install_folder: Path, job_description: Path):
         # Remove -b flag from cmd_blender
         cmd_blender.remove("-b")
 
-    # Run Postprocessing
-    process_postprocessor = subprocess.Popen(
-        [sys.executable] + cmd_postprocessor + cmd_syclops[:-2]
-    )
+    # Forward the step events of Blender and the postprocessing to the subscribers
+    with StepEventBroker():
+        # Run Postprocessing
+        process_postprocessor = subprocess.Popen(
+            [sys.executable] + cmd_postprocessor + cmd_syclops[:-2]
+        )
 
-    # Run Blender pipeline
-    if not args.show_logging:
-        with ProgressTracker(output_path) as tracker:
-            subprocess.run(
-                cmd_blender + cmd_syclops, stdout=blender_logs, stderr=blender_logs
-            )
-            if tracker.check_errors():
-                process_postprocessor.terminate()
-                raise Exception("Syclops Blender failed")
-            _wait_for_process(process_postprocessor)
-    else:
-        subprocess.run(cmd_blender + cmd_syclops)
-        _wait_for_process(process_postprocessor)
+        # Run Blender pipeline
+        try:
+            if not args.show_logging:
+                with ProgressTracker(output_path) as tracker:
+                    subprocess.run(
+                        cmd_blender + cmd_syclops, stdout=blender_logs, stderr=blender_logs
+                    )
+                    if tracker.check_errors():
+                        process_postprocessor.terminate()
+                        raise Exception("Syclops Blender failed")
+                    _wait_for_process(process_postprocessor)
+            else:
+                blender_result = subprocess.run(cmd_blender + cmd_syclops)
+                if blender_result.returncode != 0:
+                    process_postprocessor.terminate()
+                    raise Exception("Syclops Blender failed")
+                _wait_for_process(process_postprocessor)
+        finally:
+            # Export the step journals to metadata.yaml files for compatibility
+            compact_journals(output_path)
+    if process_postprocessor.returncode != 0:
+        raise Exception("Syclops Postprocessing failed")
+
+
+def _postprocess_dataset(args, install_folder: Path):
+    postprocessor_path = get_module_path("syclops.postprocessing.main")
+    # Preprocess the job like a live run, without touching the files of the dataset
+    with tempfile.TemporaryDirectory() as preprocess_folder:
+        job_filepath, asset_catalog_filepath = preprocess(
+            Path(args.config).absolute(),
+            install_folder / "asset_catalog.yaml",
+            install_folder / "schema.yaml",
+            Path(preprocess_folder),
+        )
+        _run_subprocess(
+            [
+                sys.executable,
+                postprocessor_path,
+                "--output-path",
+                str(Path(args.dataset).absolute()),
+                "--config",
+                str(job_filepath),
+                "--catalog",
+                str(asset_catalog_filepath),
+                "--offline",
+            ],
+            execution_info="Postprocessing",
+        )
 
 
 def _asset_browser():
@@ -349,7 +405,10 @@ def main():
         else:
             _crawl_assets(install_folder)
 
-    if args.job_description:
+    if args.command == "postprocess":
+        _postprocess_dataset(args, install_folder)
+
+    elif args.job_description:
         _run_syclops_job(args, install_folder, Path(args.job_description))
 
     elif args.example_job:
@@ -23,88 +23,142 @@ class BoundingBoxes(PostprocessorInterface):
         # Get classes to skip
         classes_to_skip = self._get_classes_to_skip()
 
-        # Create mask of segmentation image with classes to skip
-        mask = np.zeros(segmentation_image.shape)
-        for class_id in classes_to_skip:
-            mask += segmentation_image == class_id
+        # Pixel count and extent of every (instance, class) pair in one pass
+        pairs = self._instance_class_extents(segmentation_image, instance_image)
+        pair_instance = pairs["instance"]
+        pair_count = pairs["count"]
+        num_instances = pairs["num_instances"]
+
+        # Only use instances that have pixels outside of the classes to skip
+        pair_skipped = np.isin(pairs["class_id"], classes_to_skip)
+        instance_used = (
+            np.bincount(pair_instance[~pair_skipped], minlength=num_instances) > 0
+        )
 
-        # Get unique instance ids from masked instance image
-        unique_instance_ids = np.unique(instance_image[mask == 0])
+        # Total number of pixels per instance, including the skipped classes
+        num_pixels = np.bincount(
+            pair_instance, weights=pair_count, minlength=num_instances
+        )
 
-        output_file_name = format(step_num, "04d") + ".txt"
-        output_file = open(
-            Path(self.output_folder) / output_file_name, "w", encoding="utf-8"
+        # Remove class_ids with count less than 1% of total pixels
+        # and class_ids with count less than 5 pixels
+        pair_valid = (
+            instance_used[pair_instance]
+            & (pair_count > num_pixels[pair_instance] * 0.01)
+            & (pair_count > 5)
         )
-        # Loop over all unique instance ids
-        for instance_id in unique_instance_ids:
-            num_pixels = np.sum(instance_image == instance_id)
-            class_ids, count = np.unique(
-                segmentation_image[instance_image == instance_id], return_counts=True
-            )
 
-            # Remove class_ids with count less than 1% of total pixels
-            class_ids = class_ids[count > num_pixels * 0.01]
-            count = count[count > num_pixels * 0.01]
-            # Remove class_ids with count less than 5 pixels
-            class_ids = class_ids[count > 5]
-            count = count[count > 5]
+        if (
+            "multiple_bb_per_instance" in self.config
+            and self.config["multiple_bb_per_instance"]
+        ):
+            # One bounding box per remaining class id of an instance
+            boxes = {
+                key: value[pair_valid & ~pair_skipped] for key, value in pairs.items()
+                if key != "num_instances"
+            }
+        else:
+            # One bounding box per instance with the lowest class id as main class id
+            boxes = self._merge_instance_classes(
+                {
+                    key: value[pair_valid] for key, value in pairs.items()
+                    if key != "num_instances"
+                }
+            )
 
-            if (
-                "multiple_bb_per_instance" in self.config
-                and self.config["multiple_bb_per_instance"]
+        output_file_name = format(step_num, "04d") + ".txt"
+        with open(
+            Path(self.output_folder) / output_file_name, "w", encoding="utf-8"
+        ) as output_file:
+            for class_id, x_min, y_min, x_max, y_max in zip(
+                boxes["class_id"],
+                boxes["x_min"],
+                boxes["y_min"],
+                boxes["x_max"],
+                boxes["y_max"],
             ):
-                for class_id, count in zip(class_ids, count):
-                    # Get indices of pixels with instance id and class id
-                    instance_idx = np.where(
-                        (instance_image == instance_id)
-                        & (segmentation_image == class_id)
-                    )
-
-                    if class_id in classes_to_skip:
-                        continue
-                    # Bounding box
-                    self.write_bb(
-                        segmentation_image, class_id, output_file, instance_idx
-                    )
-
-            else:
-                try:
-                    # Get lowest class id (first class id is main class id)
-                    class_id = np.min(class_ids)
-                    # Get mask of pixels with instance id and one of the class ids
-                    instance_idx = np.where(
-                        (instance_image == instance_id)
-                        & np.isin(segmentation_image, class_ids)
-                    )
-                    # Bounding box
-                    self.write_bb(
-                        segmentation_image, class_id, output_file, instance_idx
-                    )
-                except ValueError:
-                    pass
-        # Close file
-        output_file.close()
+                output_string = self._convert_to_output_format(
+                    x_min,
+                    y_min,
+                    x_max - x_min,
+                    y_max - y_min,
+                    segmentation_image,
+                    class_id,
+                )
+                output_file.write(output_string)
+                output_file.write("\n")
 
         output_step_dict = {
             step_num: [{"type": "BOUNDING_BOX", "path": output_file_name}]
         }
         return output_step_dict
 
-    def write_bb(self, segmentation_image, class_id, output_file, instance_idx):
-        try:
-            x = np.min(instance_idx[1])
-            y = np.min(instance_idx[0])
-            w = np.max(instance_idx[1]) - x
-            h = np.max(instance_idx[0]) - y
+    @staticmethod
+    def _instance_class_extents(
+        segmentation_image: np.ndarray, instance_image: np.ndarray
+    ) -> dict:
+        """Calculate pixel count and extent of every (instance, class) pair in a single pass.
 
-            # Write to file
-            output_string = self._convert_to_output_format(
-                x, y, w, h, segmentation_image, class_id
-            )
-            output_file.write(output_string)
-            output_file.write("\n")
-        except ValueError:
-            pass
+        Every pixel gets a combined key of its instance and class index. A stable sort of
+        the keys groups the pixels of each pair while keeping them in row-major order.
+        The vertical extent is therefore given by the first and last pixel of a group,
+        the horizontal extent is reduced per group.
+
+        Args:
+            segmentation_image (np.ndarray): Semantic segmentation mask
+            instance_image (np.ndarray): Instance segmentation mask
+
+        Returns:
+            dict: Arrays with one entry per pair, sorted by instance id and class id.
+                "instance" is the index of the pair's instance in the sorted instance ids.
+        """
+        width = instance_image.shape[1]
+        _, instance_index = np.unique(instance_image.ravel(), return_inverse=True)
+        class_ids, class_index = np.unique(
+            segmentation_image.ravel(), return_inverse=True
+        )
+        num_classes = class_ids.size
+
+        keys = instance_index.ravel().astype(np.int64) * num_classes + class_index.ravel()
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], sorted_keys.size] - 1
+        rows, cols = np.divmod(order, width)
+
+        pair_keys = sorted_keys[starts]
+        pair_instance = pair_keys // num_classes
+        return {
+            "instance": pair_instance,
+            "class_id": class_ids[pair_keys % num_classes],
+            "count": ends - starts + 1,
+            "x_min": np.minimum.reduceat(cols, starts),
+            "y_min": rows[starts],
+            "x_max": np.maximum.reduceat(cols, starts),
+            "y_max": rows[ends],
+            "num_instances": int(pair_instance[-1]) + 1,
+        }
+
+    @staticmethod
+    def _merge_instance_classes(pairs: dict) -> dict:
+        """Merge the (instance, class) pairs of each instance into a single bounding box.
+
+        Args:
+            pairs (dict): Pair arrays sorted by instance id and class id
+
+        Returns:
+            dict: Bounding boxes with the lowest class id of each instance
+        """
+        if pairs["instance"].size == 0:
+            return pairs
+        groups = np.flatnonzero(np.r_[True, np.diff(pairs["instance"]) != 0])
+        return {
+            "class_id": pairs["class_id"][groups],
+            "x_min": np.minimum.reduceat(pairs["x_min"], groups),
+            "y_min": np.minimum.reduceat(pairs["y_min"], groups),
+            "x_max": np.maximum.reduceat(pairs["x_max"], groups),
+            "y_max": np.maximum.reduceat(pairs["y_max"], groups),
+        }
 
     def process_all_steps(self) -> dict:
         pass
@@ -134,8 +188,8 @@ class BoundingBoxes(PostprocessorInterface):
         semantic_path = paths["SEMANTIC_SEGMENTATION"][0]
 
         if os.path.isfile(semantic_path) and os.path.isfile(instance_path):
-            segmentation_image = np.load(semantic_path)["array"]
-            instance_image = np.load(instance_path)["array"]
+            segmentation_image = self.load_array(semantic_path)
+            instance_image = self.load_array(instance_path)
         else:
             raise FileNotFoundError("Semantic or instance segmentation image not found")
         return segmentation_image, instance_image
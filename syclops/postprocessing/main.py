@@ -1,11 +1,21 @@
 import argparse
+import multiprocessing
+import os
+import signal
 import sys
-import threading
+import time
+from multiprocessing.pool import ThreadPool
 from pathlib import Path
 
 import yaml
+from rich.progress import MofNCompleteColumn, Progress
 from syclops import utility
 
+EXECUTORS = {
+    "thread": ThreadPool,
+    "process": multiprocessing.Pool,
+}
+
 argv = sys.argv
 parser = argparse.ArgumentParser()
 parser.add_argument(
@@ -23,8 +33,114 @@ parser.add_argument(
     help="Output path folder",
     default="",
 )
+parser.add_argument(
+    "--offline",
+    help="Postprocess a finished dataset in a process pool instead of waiting for new steps",
+    action="store_true",
+)
+
+
+def run_postprocessors(
+    postprocessing_jobs: list,
+    executor: str = "thread",
+    polling_delay: float = 0.1,
+    array_cache_mb: int = utility.DEFAULT_ARRAY_CACHE_MB,
+):
+    """Run the postprocessor instances in a thread or process pool.
+
+    Every instance runs until all steps are processed and can wait for the outputs of
+    another one, so the pool has exactly one worker per instance. Steps of a single
+    instance are processed in parallel with its "workers" config.
+
+    Args:
+        postprocessing_jobs (list): Postprocessor instances to run
+        executor (str, optional): Either "thread" or "process". Defaults to "thread".
+        polling_delay (float, optional): Delay between status checks in seconds. Defaults to 0.1.
+        array_cache_mb (int, optional): Budget of the decoded array cache per worker in megabytes.
+
+    Raises:
+        ValueError: If the executor is not supported.
+        Exception: The first exception raised by one of the postprocessors.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(
+            f"Unknown postprocessing executor {executor}. Use one of {list(EXECUTORS)}"
+        )
+    if not postprocessing_jobs:
+        return
+    workers = len(postprocessing_jobs)
+
+    if executor == "process":
+        # Worker processes share decoded arrays through shared memory
+        shared_prefix = f"syclops_array_{os.getpid()}"
+        pool = EXECUTORS[executor](
+            workers,
+            initializer=utility.configure_array_cache,
+            initargs=(array_cache_mb, shared_prefix),
+        )
+    else:
+        shared_prefix = None
+        utility.configure_array_cache(array_cache_mb)
+        pool = EXECUTORS[executor](workers)
+    try:
+        results = [pool.apply_async(job.run) for job in postprocessing_jobs]
+        pool.close()
+        while results:
+            for result in [r for r in results if r.ready()]:
+                # Re-raises the exception of a failed postprocessor
+                result.get()
+                results.remove(result)
+            time.sleep(polling_delay)
+        pool.join()
+    finally:
+        # Stops remaining workers if a postprocessor failed or the process is shut down
+        pool.terminate()
+        if shared_prefix is not None:
+            utility.remove_shared_arrays(shared_prefix)
 
 
+def run_offline(postprocessing_jobs: list, workers: int = None):
+    """Run the postprocessor instances one after another on a finished dataset.
+    The source metadata is loaded once and the steps are distributed over a process pool.
+
+    Args:
+        postprocessing_jobs (list): Postprocessor instances to run
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+    """
+    workers = workers or os.cpu_count()
+    with Progress(*Progress.get_default_columns(), MofNCompleteColumn()) as progress:
+        for job in postprocessing_jobs:
+            steps = job.prepare_offline()
+            task = progress.add_task(job.config["id"], total=len(steps))
+            chunksize = max(1, min(64, len(steps) // (4 * workers)))
+            processed_dicts = []
+            with multiprocessing.Pool(
+                workers, initializer=_init_offline_worker, initargs=(job,)
+            ) as pool:
+                for processed_dict in pool.imap_unordered(
+                    _process_offline_step, steps, chunksize
+                ):
+                    processed_dicts.append(processed_dict)
+                    progress.advance(task)
+            job.finish_offline(processed_dicts)
+
+
+_offline_job = None
+
+
+def _init_offline_worker(job):
+    global _offline_job
+    _offline_job = job
+
+
+def _process_offline_step(step: tuple) -> dict:
+    step_num, step_dict = step
+    return _offline_job.process_step(step_num, step_dict)
+
+
+def _exit_on_signal(signum, frame):
+    sys.exit(128 + signum)
+
 
 def main():
     args = parser.parse_args(argv[1:])
@@ -50,11 +166,21 @@ def main():
             job_config["postprocessing"],
         )
 
-        jobs = [threading.Thread(target=job.run) for job in postprocessing_jobs]
-        for job in jobs:
-            job.start()
-        for job in jobs:
-            job.join()
+        # Shut down the workers when the Blender job is terminated
+        signal.signal(signal.SIGTERM, _exit_on_signal)
+
+        settings = job_config.get("postprocessing_settings", {})
+        if args.offline:
+            run_offline(postprocessing_jobs, workers=settings.get("workers"))
+        else:
+            run_postprocessors(
+                postprocessing_jobs,
+                executor=settings.get("executor", "thread"),
+                array_cache_mb=settings.get(
+                    "array_cache_mb",
+                    utility.DEFAULT_ARRAY_CACHE_MB,
+                ),
+            )
 
 
 if __name__ == "__main__":
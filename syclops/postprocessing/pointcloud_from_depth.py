@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import numpy as np
+import yaml
+from syclops import utility
+from syclops.postprocessing.postprocessor_interface import \
+    PostprocessorInterface
+
+
+class PointcloudFromDepth(PostprocessorInterface):
+    meta_description = {
+        "type": "POINTCLOUD",
+        "format": "NPZ",
+        "description": "Contains the x,y and z coordinate of every pixel in the camera coordinate system in meters. Derived from the depth output and the camera intrinsics.",
+    }
+
+    def __init__(self, config):
+        super().__init__(config)
+
+    def _prepare(self):
+        array_format = self.config.get("format", utility.DEFAULT_ARRAY_FORMAT)
+        self.encoding = utility.create_encoding(
+            self.config.get("encoding", "float32"),
+            self.config.get("precision", utility.DEFAULT_PRECISION),
+            self.config.get("offset", 0.0),
+        )
+        self.meta_description = {
+            **PointcloudFromDepth.meta_description,
+            "format": utility.FORMAT_NAMES[utility.ARRAY_FORMATS[array_format]],
+        }
+        if self.encoding is not None:
+            self.meta_description["encoding"] = self.encoding
+        # The depth output can be quantized itself
+        self.depth_encoding = next(
+            (
+                m["metadata"].get("encoding")
+                for m in self.input_metadata.values()
+                if m["metadata"]["type"] == "DEPTH"
+            ),
+            None,
+        )
+
+    def process_step(self, step_num: int, step_dict: dict) -> dict:
+        paths = self.get_full_paths_from_step_dict(step_dict)
+        depth = utility.decode_array(
+            self.load_array(paths["DEPTH"][0]), self.depth_encoding
+        )
+        with open(paths["INTRINSICS"][0], "r") as f:
+            camera_matrix = np.array(yaml.safe_load(f)["camera_matrix"])
+
+        pointcloud = utility.depth_to_pointcloud(depth, camera_matrix)
+        output_file = utility.save_array(
+            str(Path(self.output_folder) / format(step_num, "04d")),
+            utility.encode_array(pointcloud, self.encoding),
+            self.config.get("format", utility.DEFAULT_ARRAY_FORMAT),
+            self.config.get("compression_level"),
+        )
+
+        output_step_dict = {
+            step_num: [{"type": "POINTCLOUD", "path": Path(output_file).name}]
+        }
+        return output_step_dict
+
+    def process_all_steps(self) -> dict:
+        pass
+
+    def update_output_dict(self, output_dict: dict):
+        output_dict["pointcloud"] = self._output_folder_path()
+        return output_dict
+
+    def _output_folder_path(self):
+        return str(
+            Path(self.config["parent_dir"])
+            / f"{self.sensor_name}_annotations"
+            / "pointcloud"
+        )
@@ -1,3 +1,4 @@
+import heapq
 import os
 from abc import ABC
 from pathlib import Path
@@ -5,6 +6,7 @@ from typing import Union
 
 import ruamel.yaml as yaml
 from filelock import FileLock, Timeout
+from syclops import utility
 
 
 class PostprocessorBase(ABC):
@@ -12,8 +14,13 @@ class PostprocessorBase(ABC):
         self.config: dict = config
         self.input_metadata: dict = {}
         self.output_metadata: dict = {}
+        self.scanned_metadata_files: set = set()
+        self.event_subscriber = None
 
         self.processed_steps: dict = {}
+        self.available_steps: dict = {}
+        self.ready_steps: list = []
+        self.finished_steps: int = 0
         self.expected_steps: int = 0
         self.sensor_name: str = ""
         self.output_folder: str = ""
@@ -24,14 +31,29 @@ class PostprocessorBase(ABC):
         self._create_output_folder()
 
     def _write_output_metadata(self, processed_dict: dict):
-        """Function that writes the output metadata to the metadata.yaml file.
+        """Function that appends the processed steps to the metadata journal.
 
         Args:
             processed_dict (dict): Dictionary containing the processed data of one or multiple steps
         """
         self._update_output_metadata(processed_dict)
+        if processed_dict:
+            with utility.StepJournalWriter(self._output_metadata_path("jsonl")) as writer:
+                writer.data.update(
+                    {k: v for k, v in self.output_metadata.items() if k != "steps"}
+                )
+                for step, step_dicts in processed_dict.items():
+                    writer.add_step(step, step_dicts)
+
+    def _export_output_metadata(self):
+        """Function that writes the complete output metadata to the metadata.yaml file."""
         self._safe_write(self.output_metadata)
 
+    def _output_metadata_path(self, extension: str) -> str:
+        return str(
+            Path(self.output_folder) / f'{self.config["id"]}_metadata.{extension}'
+        )
+
     def _update_output_metadata(self, processed_dict: dict):
         """Function that updates the output_metadata instance variable.
 
@@ -70,43 +92,50 @@ class PostprocessorBase(ABC):
 
     def _finished_all_steps(self) -> bool:
         """Boolean function that checks if all expected steps are available."""
-        processed_steps = sum(
-            [
-                1
-                for step, step_dict in self.processed_steps.items()
-                if step_dict["finished"]
-            ]
-        )
-        return processed_steps == self.expected_steps
+        return self.finished_steps == self.expected_steps
 
     def _get_unprocessed_step(self) -> Union[int, None]:
-        """Function that returns a single unprocessed step.
+        """Function that returns the lowest unprocessed step of the ready queue.
 
         Returns:
             Union[int, None]: Returns the step number and the step dictionary if there is an unprocessed step.
             Otherwise it returns None.
         """
-        if self.processed_steps:
-            for step_num, step_dict in self.processed_steps.items():
-                if not step_dict["finished"]:
-                    return step_num, step_dict["sources"]
+        while self.ready_steps:
+            step_num = heapq.heappop(self.ready_steps)
+            step_dict = self.processed_steps[step_num]
+            if not step_dict["finished"] and not step_dict["dispatched"]:
+                return step_num, step_dict["sources"]
         return None, None
 
     def _find_metadata_yaml(self):
-        """Function that finds the metadata.yaml files of the source metadata files."""
-        for root, dirs, files in os.walk(self.config["parent_dir"]):
-            files_filtered = [
-                f for f in files if "metadata.yaml" in f and ".lock" not in f
-            ]
-            for file in files_filtered:
-                metadata_file_path = os.path.join(root, file)
-                metadata = self._safe_read(metadata_file_path)
-                if metadata["id"] in self.config["sources"]:
-                    self.input_metadata[metadata["id"]] = {
-                        "metadata": metadata,
-                        "path": metadata_file_path,
-                    }
-                    self._set_sensor_name()
+        """Function that finds the metadata journals of the source metadata files."""
+        for metadata_file_path in utility.find_metadata_files(self.config["parent_dir"]):
+            self._register_metadata_file(metadata_file_path)
+
+    def _register_metadata_file(self, metadata_file_path: str):
+        """Function that adds a metadata file to the input metadata if it belongs to a source.
+        Each file is only read until its header is available.
+
+        Args:
+            metadata_file_path (str): Path to the metadata journal or metadata.yaml file
+        """
+        metadata_file_path = os.path.abspath(metadata_file_path)
+        if metadata_file_path in self.scanned_metadata_files:
+            return
+        reader = utility.StepJournalReader(metadata_file_path)
+        reader.update()
+        if not reader.has_header:
+            return
+        self.scanned_metadata_files.add(metadata_file_path)
+        metadata = reader.metadata
+        if metadata["id"] in self.config["sources"]:
+            self.input_metadata[metadata["id"]] = {
+                "metadata": metadata,
+                "path": metadata_file_path,
+                "reader": reader,
+            }
+            self._set_sensor_name()
 
     def _set_sensor_name(self):
         """Set the instance variable of the sensor name."""
@@ -124,9 +153,7 @@ class PostprocessorBase(ABC):
         Raises:
             TimeoutError: If the filelock could not be acquired within 5 seconds.
         """
-        metadata_file_path = str(
-            Path(self.output_folder) / f'{self.config["id"]}_metadata.yaml'
-        )
+        metadata_file_path = self._output_metadata_path("yaml")
         try:
             lock = FileLock(f"{metadata_file_path}.lock", timeout=5)
             with lock.acquire():
@@ -157,7 +184,13 @@ class PostprocessorBase(ABC):
 
     def _update_processed_step_dict(self, step_id: int):
         """Functino that updates the processed_steps dict if a step is finished."""
-        self.processed_steps[step_id]["finished"] = True
+        if not self.processed_steps[step_id]["finished"]:
+            self.processed_steps[step_id]["finished"] = True
+            self.finished_steps += 1
+
+    def _update_dispatched_step_dict(self, step_id: int):
+        """Function that marks a step as being processed, so it is not handed out twice."""
+        self.processed_steps[step_id]["dispatched"] = True
 
     def _get_dict_of_available_steps(self, available_steps: list) -> dict:
         """Function that returns the dictionary of available steps.
@@ -173,32 +206,49 @@ class PostprocessorBase(ABC):
             s for s in available_steps if s not in self.processed_steps.keys()
         ]
         for step in steps_filtered:
-            available_steps_dict[step] = {"sources": {}, "finished": False}
+            available_steps_dict[step] = {
+                "sources": {},
+                "finished": False,
+                "dispatched": False,
+            }
             for source_id, metadata_dict in self.input_metadata.items():
                 available_steps_dict[step]["sources"][source_id] = metadata_dict[
                     "metadata"
                 ]["steps"][step]
         return available_steps_dict
 
-    def _intersection_of_available_steps(self) -> list:
-        """Function that returns a list of steps that are available for all source metadata files.
+    def _intersection_of_available_steps(self, candidate_steps: set) -> list:
+        """Function that returns the candidate steps that are available for all source metadata files.
+
+        Args:
+            candidate_steps (set): Steps that were newly added to at least one source
 
         Returns:
             list: List of available steps
         """
-        all_steps = [
-            list(v["metadata"]["steps"].keys()) for v in self.input_metadata.values()
+        return [
+            s
+            for s in candidate_steps
+            if all(s in steps for steps in self.available_steps.values())
         ]
-        available = [
-            s for s in all_steps[0] if all([s in steps for steps in all_steps])
-        ]
-        return available
 
     def _update_metadata(self):
-        """Function that reads and updates the metadata of the source metadata files."""
-        for data_id, _ in self.input_metadata.items():
-            self.input_metadata[data_id]["metadata"] = self._safe_read(
-                self.input_metadata[data_id]["path"]
-            )
-        available_steps = self._intersection_of_available_steps()
-        self.processed_steps.update(self._get_dict_of_available_steps(available_steps))
+        """Function that reads the newly appended steps of the source metadata files
+        and pushes the steps that are complete for all sources to the ready queue.
+        """
+        candidate_steps = set()
+        for source_id, metadata_dict in self.input_metadata.items():
+            if source_id not in self.available_steps:
+                # Steps that were read while searching for the source
+                self.available_steps[source_id] = set()
+                new_steps = list(metadata_dict["metadata"]["steps"])
+                new_steps += metadata_dict["reader"].update()
+            else:
+                new_steps = metadata_dict["reader"].update()
+            self.available_steps[source_id].update(new_steps)
+            candidate_steps.update(new_steps)
+        available_steps = self._intersection_of_available_steps(candidate_steps)
+        available_steps_dict = self._get_dict_of_available_steps(available_steps)
+        self.processed_steps.update(available_steps_dict)
+        for step in available_steps_dict:
+            heapq.heappush(self.ready_steps, step)
@@ -1,7 +1,10 @@
+import heapq
 import time
 from abc import abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
+from syclops import utility
 from syclops.postprocessing.postprocessor_base import PostprocessorBase
 
 
@@ -16,26 +19,154 @@ class PostprocessorInterface(PostprocessorBase):
 
     def run(self):
         """Main function that does the following:
-        1. Searches until all needed source metadata.yaml files are found.
+        1. Searches until all needed source metadata journals are found.
+           Steps are announced on the event bus of the job. Without it, the files are polled.
         2. Processes individual steps/frames once they become available.
+           If "workers" is set in the config, multiple steps are processed in parallel.
         3. When all steps are available, the process_all_steps function is called.
+        4. The complete output metadata is exported to a metadata.yaml file.
         """
-        while not self._source_ids_found():
-            self._find_metadata_yaml()
-            time.sleep(self.polling_delay)
+        self.event_subscriber = utility.StepEventSubscriber.from_environment()
+        try:
+            self._find_sources()
+            self._setup(self._output_folder_path())
+            self._prepare()
+            workers = self.config.get("workers", 1)
+            if workers > 1:
+                max_inflight = self.config.get("max_inflight", 2 * workers)
+                self._process_steps_concurrently(workers, max_inflight)
+            else:
+                self._process_steps()
+            processed_dict = self.process_all_steps()
+            self._write_output_metadata(processed_dict)
+            self._export_output_metadata()
+        finally:
+            if self.event_subscriber is not None:
+                self.event_subscriber.close()
+
+    def prepare_offline(self) -> list:
+        """Load the complete source metadata of a finished dataset once.
+        The returned steps can be processed in any order, e.g. in a process pool.
+
+        Raises:
+            FileNotFoundError: If the metadata of a source is missing in the dataset.
+
+        Returns:
+            list: Tuples of step number and step dictionary, sorted by step number
+        """
+        self._find_metadata_yaml()
+        if not self._source_ids_found():
+            missing = set(self.config["sources"]) - set(self.input_metadata)
+            raise FileNotFoundError(f"Metadata of sources {missing} not found")
         self._setup(self._output_folder_path())
+        journal_path = Path(self._output_metadata_path("jsonl"))
+        if journal_path.exists():
+            # Previous results of this postprocessor are replaced
+            journal_path.unlink()
         self._prepare()
+        self._update_metadata()
+        steps = []
+        while self.ready_steps:
+            steps.append(self._get_unprocessed_step())
+        return steps
+
+    def finish_offline(self, processed_dicts: list):
+        """Write the results of prepare_offline's steps and process all steps.
+
+        Args:
+            processed_dicts (list): Return values of process_step
+        """
+        merged_dict = {}
+        for processed_dict in processed_dicts:
+            if processed_dict:
+                merged_dict.update(processed_dict)
+        self._write_output_metadata(dict(sorted(merged_dict.items())))
+        processed_dict = self.process_all_steps()
+        self._write_output_metadata(processed_dict)
+        self._export_output_metadata()
+
+    def _find_sources(self):
+        """Wait until the metadata files of all sources are found.
+        The output folder is scanned at the start. With an event bus, the sources are then
+        taken from the step events and the folder is only rescanned as a fallback.
+        """
+        last_scan = 0.0
+        while not self._source_ids_found():
+            if (
+                self.event_subscriber is None
+                or time.time() - last_scan > utility.FALLBACK_SCAN_INTERVAL
+            ):
+                self._find_metadata_yaml()
+                last_scan = time.time()
+            if not self._source_ids_found():
+                self._wait_for_events()
+
+    def _wait_for_events(self):
+        """Wait until new steps are announced on the event bus, at most for the polling delay."""
+        if self.event_subscriber is None:
+            time.sleep(self.polling_delay)
+            return
+        for event in self.event_subscriber.wait(self.polling_delay):
+            if event["id"] in self.config["sources"]:
+                self._register_metadata_file(event["path"])
+
+    def _process_steps(self):
+        """Process one step after another as soon as they become available."""
         while not self._finished_all_steps():
-            self._update_metadata()
+            # Only read new source steps once the ready queue is drained
+            if not self.ready_steps:
+                self._update_metadata()
             step_num, step_dict = self._get_unprocessed_step()
             if step_num is not None:
                 processed_dict = self.process_step(step_num, step_dict)
                 self._write_output_metadata(processed_dict)
                 self._update_processed_step_dict(step_num)
             else:
-                time.sleep(self.polling_delay)
-        processed_dict = self.process_all_steps()
-        self._write_output_metadata(processed_dict)
+                self._wait_for_events()
+
+    def _process_steps_concurrently(self, workers: int, max_inflight: int):
+        """Process available steps in a thread pool.
+
+        Finished results are buffered and committed to the output metadata in ascending
+        step order, once no lower dispatched step is still being processed.
+
+        Args:
+            workers (int): Number of worker threads
+            max_inflight (int): Maximum number of dispatched steps that are not yet committed
+        """
+        running = {}
+        completed = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while not self._finished_all_steps():
+                self._update_metadata()
+                while len(running) + len(completed) < max_inflight:
+                    step_num, step_dict = self._get_unprocessed_step()
+                    if step_num is None:
+                        break
+                    self._update_dispatched_step_dict(step_num)
+                    running[step_num] = executor.submit(
+                        self.process_step, step_num, step_dict
+                    )
+
+                if not running and not completed:
+                    self._wait_for_events()
+                    continue
+                # Wait for any step, but keep polling for new steps
+                if running:
+                    wait(
+                        running.values(),
+                        timeout=self.polling_delay,
+                        return_when=FIRST_COMPLETED,
+                    )
+                for step_num in [s for s, f in running.items() if f.done()]:
+                    heapq.heappush(completed, (step_num, running.pop(step_num).result()))
+                lowest_running = min(running, default=None)
+                while completed and (
+                    lowest_running is None or completed[0][0] < lowest_running
+                ):
+                    step_num, processed_dict = heapq.heappop(completed)
+                    self._write_output_metadata(processed_dict)
+                    self._update_processed_step_dict(step_num)
 
     # INTERFACE
 
@@ -109,6 +240,19 @@ class PostprocessorInterface(PostprocessorBase):
         }
         return paths
 
+    def load_array(self, path: str, key: str = "array"):
+        """Load an array of a source file through the array cache of the process.
+        Postprocessors that read the same file only decode it once.
+
+        Args:
+            path (str): Path to the .npz or .npy file
+            key (str, optional): Name of the array in a .npz file. Defaults to "array".
+
+        Returns:
+            np.ndarray: Read-only array
+        """
+        return utility.get_array_cache().load(path, key)
+
     def get_full_paths_from_step_dict(self, step_dict: dict):
         base_paths = self.get_base_paths_by_type()
         paths_all = {}
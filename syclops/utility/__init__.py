@@ -9,12 +9,23 @@ if 'bpy' in sys.modules:
                             get_asset_path, get_lib_path, import_assets,
                             import_file, import_objects, link_duplicate_objs,
                             load_module, remove_unused_objects, split_asset_name)
-    from .blender_utils import (ObjPointer, RevertAfter, DisjointSet, add_volume_attribute,
+    from .blender_utils import (ObjPointer, RevertAfter, SceneSnapshot, DisjointSet,
+                                add_volume_attribute, record_state, record_node_tree,
+                                get_revert_mode, REVERT_MODES,
+                                RenderTimer,
+                                DEFAULT_REVERT_MODE,
                                 append_output_path, apply_modifiers,
                                 apply_transform, clear_scene, configure_render,
+                                configure_render_devices, apply_render_settings,
                                 convex_decomposition, create_clumps,
                                 create_collection, decimate_mesh, duplicate_object,
-                                filter_objects, get_job_conf, load_from_blend,
+                                filter_objects, get_job_conf, get_instance_id_hash,
+                                get_catalog, get_scene_dict, set_scene_dict, find_object_by_uuid,
+                                invalidate_object_index, get_image_texture,
+                                image_memory, evict_images, collect_garbage,
+                                memory_telemetry, GC_DATA_COLLECTIONS, DEFAULT_GC_INTERVAL,
+                                geometry_hash, mesh_volume,
+                                load_from_blend,
                                 load_image, load_img_as_array, merge_objects,
                                 refresh_modifiers, render_visibility,
                                 resize_textures, set_active_collection, set_seeds,
@@ -25,8 +36,26 @@ from .sampling_utils import (sample_linear,
                             sample_step, sample_uniform, sample_wildcard, apply_sampling)
 
 from .general_utils import (AtomicYAMLWriter, create_folder,
-                            find_class_id_mapping,get_site_packages_path, get_module_path, hash_vector)
-from .postprocessing_utils import (crawl_output_meta, filter_type, create_module_instances_pp)
+                            find_class_id_mapping,get_site_packages_path, get_module_path, hash_vector,
+                            get_rss,
+                            hash_vectors, HASH_SCHEMES,
+                            DEFAULT_HASH_SCHEME)
+from .event_utils import (StepEventBroker, StepEventSubscriber, publish_step_event,
+                          FALLBACK_SCAN_INTERVAL)
+from .metadata_utils import (StepJournalWriter, StepJournalReader, compact_journals,
+                             export_journal, find_metadata_files, read_metadata,
+                             write_journal_step)
+from .array_utils import (save_array, load_array, array_format_name, ARRAY_FORMATS,
+                          DEFAULT_ARRAY_FORMAT, FORMAT_NAMES, create_encoding, encode_array,
+                          decode_array, depth_to_pointcloud, DEFAULT_PRECISION)
+from .output_writer_utils import (AsyncOutputWriter, configure_output_writer,
+                                  get_output_writer, close_output_writer,
+                                  write_array_output, convert_pixel_annotation,
+                                  smallest_int_dtype, INSTANCE_ID_TABLE,
+                                  DEFAULT_OUTPUT_WRITER_WORKERS, DEFAULT_MAX_BACKLOG)
+from .postprocessing_utils import (crawl_output_meta, filter_type, create_module_instances_pp,
+                                   ArrayCache, configure_array_cache, get_array_cache,
+                                   remove_shared_arrays, DEFAULT_ARRAY_CACHE_MB)
 
 from .setup_utils import (download_file, extract_zip, extract_tar, install_blender, get_or_create_install_folder)
 
@@ -0,0 +1,353 @@
+"""Utility module for writing and reading the array outputs."""
+
+import argparse
+import io
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+
+# File extension of each array format
+ARRAY_FORMATS = {
+    "npz_compressed": ".npz",
+    "npz_stored": ".npz",
+    "npy": ".npy",
+    "zstd": ".zst",
+    "lz4": ".lz4",
+}
+DEFAULT_ARRAY_FORMAT = "npz_compressed"
+
+# Name of the file type in the output metadata
+FORMAT_NAMES = {".npz": "NPZ", ".npy": "NPY", ".zst": "ZSTD", ".lz4": "LZ4"}
+
+# Leading bytes of each file type, used to detect the codec of a file
+MAGIC_BYTES = {
+    b"\x93NUMPY": "npy",
+    b"PK\x03\x04": "npz",
+    b"\x28\xb5\x2f\xfd": "zstd",
+    b"\x04\x22\x4d\x18": "lz4",
+}
+
+DEFAULT_COMPRESSION_LEVELS = {"zstd": 3, "lz4": 0}
+
+# Quantized encodings of metric outputs like depth and pointcloud
+QUANTIZED_DTYPES = {"float16": np.float16, "uint16": np.uint16, "int16": np.int16}
+DEFAULT_PRECISION = 0.001
+
+
+def _import_codec(codec: str):
+    """Import the optional module of a codec."""
+    try:
+        if codec == "zstd":
+            import zstandard
+
+            return zstandard
+        import lz4.frame
+
+        return lz4.frame
+    except ImportError as e:
+        raise ImportError(
+            f"The {codec} array format requires an optional dependency. "
+            "Install it with: pip install syclops[compression]"
+        ) from e
+
+
+def save_array(
+    path: str,
+    array: np.ndarray,
+    array_format: str = DEFAULT_ARRAY_FORMAT,
+    compression_level: int = None,
+) -> str:
+    """Save an array in the given format.
+
+    The zstd and lz4 formats compress the .npy representation of the array.
+    zstd uses all CPU cores.
+
+    Args:
+        path: Path to the file. The extension is replaced by the one of the format.
+        array: Array to save.
+        array_format: One of "npz_compressed", "npz_stored", "npy", "zstd" or "lz4".
+        compression_level: Level of the zstd or lz4 codec. Defaults to the codec's default.
+
+    Returns:
+        str: Path to the written file.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if array_format not in ARRAY_FORMATS:
+        raise ValueError(
+            f"Unknown array format {array_format}. Use one of {list(ARRAY_FORMATS)}"
+        )
+    path = str(Path(path).with_suffix(ARRAY_FORMATS[array_format]))
+    if compression_level is None:
+        compression_level = DEFAULT_COMPRESSION_LEVELS.get(array_format)
+    if array_format == "npz_compressed":
+        np.savez_compressed(path, array=array)
+    elif array_format == "npz_stored":
+        np.savez(path, array=array)
+    elif array_format == "npy":
+        np.save(path, array)
+    else:
+        codec = _import_codec(array_format)
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        if array_format == "zstd":
+            compressor = codec.ZstdCompressor(level=compression_level, threads=-1)
+            payload = compressor.compress(buffer.getbuffer())
+        else:
+            payload = codec.compress(
+                buffer.getbuffer(), compression_level=compression_level
+            )
+        with open(path, "wb") as f:
+            f.write(payload)
+    return path
+
+
+def detect_array_format(path: str) -> str:
+    """Detect the codec of an array file from its leading bytes.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        str: "npy", "npz", "zstd" or "lz4".
+
+    Raises:
+        ValueError: If the file type is unknown.
+    """
+    with open(path, "rb") as f:
+        header = f.read(6)
+    for magic, codec in MAGIC_BYTES.items():
+        if header.startswith(magic):
+            return codec
+    raise ValueError(f"Unknown array file format of {path}")
+
+
+def load_array(path: str, key: str = "array", mmap: bool = True) -> np.ndarray:
+    """Load an array written by save_array.
+
+    The codec is detected from the file header. Uncompressed .npy files are
+    memory-mapped read-only, so only the accessed parts are read.
+
+    Args:
+        path: Path to the array file.
+        key: Name of the array in a .npz file.
+        mmap: Whether to memory-map .npy files.
+
+    Returns:
+        np.ndarray: The array.
+    """
+    codec = detect_array_format(path)
+    if codec == "npy":
+        return np.load(path, mmap_mode="r" if mmap else None)
+    if codec == "npz":
+        with np.load(path) as data:
+            return data[key]
+    module = _import_codec(codec)
+    with open(path, "rb") as f:
+        payload = f.read()
+    if codec == "zstd":
+        data = module.ZstdDecompressor().decompress(payload)
+    else:
+        data = module.decompress(payload)
+    return np.load(io.BytesIO(data))
+
+
+def create_encoding(
+    dtype: str,
+    precision: Union[float, List[float]] = DEFAULT_PRECISION,
+    offset: Union[float, List[float]] = 0.0,
+) -> Union[dict, None]:
+    """Describe a quantized encoding of metric values for the output metadata.
+
+    Integer encodings store round((value - offset) / precision), so the decoded values
+    are within half the precision of the original values. float16 keeps a relative
+    precision of 2^-11.
+
+    Args:
+        dtype: One of "float32", "float16", "uint16" or "int16".
+        precision: Step size of the integer encodings, e.g. 0.001 for millimetres.
+            A list sets the step size per axis.
+        offset: Value that is encoded as 0. A list sets the offset per axis.
+
+    Returns:
+        Union[dict, None]: The encoding, None for float32.
+
+    Raises:
+        ValueError: If the dtype is not supported.
+    """
+    if dtype == "float32":
+        return None
+    if dtype not in QUANTIZED_DTYPES:
+        raise ValueError(
+            f"Unknown encoding {dtype}. Use one of {['float32'] + list(QUANTIZED_DTYPES)}"
+        )
+    if dtype == "float16":
+        return {"dtype": dtype, "relative_tolerance": 2.0**-11}
+    return {
+        "dtype": dtype,
+        "scale": precision,
+        "offset": offset,
+        "tolerance": (np.asarray(precision, dtype=np.float64) / 2).tolist(),
+    }
+
+
+def encode_array(array: np.ndarray, encoding: dict = None) -> np.ndarray:
+    """Quantize metric values with an encoding of create_encoding.
+
+    Values outside of the range of an integer encoding are clipped.
+
+    Args:
+        array: Metric values. Per axis scales and offsets apply to the last dimension.
+        encoding: The encoding. None keeps the array unchanged.
+
+    Returns:
+        np.ndarray: The encoded array.
+    """
+    if encoding is None:
+        return array
+    dtype = QUANTIZED_DTYPES[encoding["dtype"]]
+    if dtype == np.float16:
+        return array.astype(np.float16)
+    info = np.iinfo(dtype)
+    values = np.round((array - np.asarray(encoding["offset"])) / np.asarray(encoding["scale"]))
+    clipped = np.count_nonzero((values < info.min) | (values > info.max))
+    if clipped:
+        logging.warning(
+            "%d values are outside of the %s encoding range and were clipped",
+            clipped,
+            encoding["dtype"],
+        )
+    return np.clip(values, info.min, info.max).astype(dtype)
+
+
+def decode_array(array: np.ndarray, encoding: dict = None) -> np.ndarray:
+    """Restore the metric values of an array encoded with encode_array.
+
+    Args:
+        array: The encoded array, e.g. loaded with load_array.
+        encoding: The "encoding" of the output metadata. None returns the array unchanged.
+
+    Returns:
+        np.ndarray: Values within the tolerance of the encoding, float64 for integer encodings.
+    """
+    if encoding is None:
+        return array
+    if encoding["dtype"] == "float16":
+        return np.asarray(array, dtype=np.float32)
+    values = np.asarray(array, dtype=np.float64)
+    return values * np.asarray(encoding["scale"]) + np.asarray(encoding["offset"])
+
+
+def depth_to_pointcloud(depth: np.ndarray, camera_matrix: np.ndarray) -> np.ndarray:
+    """Unproject a depth output to a pointcloud in camera coordinates.
+
+    The result uses the camera frame of the rendered pointcloud output: x points right,
+    y up and the camera looks along -z. Each pixel is unprojected through its center.
+    Pixels without depth become (0, 0, 0).
+
+    Args:
+        depth: Z depth of each pixel in meters, shape (height, width).
+        camera_matrix: 3x3 camera matrix of the intrinsics output.
+
+    Returns:
+        np.ndarray: float32 array of shape (height, width, 3).
+    """
+    camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+    f_u, f_v = camera_matrix[0, 0], camera_matrix[1, 1]
+    u_0, v_0 = camera_matrix[0, 2], camera_matrix[1, 2]
+    height, width = depth.shape
+    # Rays through the pixel centers, v is counted from the top image row
+    ray_x = ((np.arange(width) + 0.5 - u_0) / f_u).astype(np.float32)
+    ray_y = (-(np.arange(height) + 0.5 - v_0) / f_v).astype(np.float32)
+    depth = np.asarray(depth, dtype=np.float32)
+    pointcloud = np.empty((height, width, 3), dtype=np.float32)
+    np.multiply(depth, ray_x[np.newaxis, :], out=pointcloud[:, :, 0])
+    np.multiply(depth, ray_y[:, np.newaxis], out=pointcloud[:, :, 1])
+    np.negative(depth, out=pointcloud[:, :, 2])
+    return pointcloud
+
+
+def array_format_name(path: str) -> str:
+    """Name of the file format of an array file for the output metadata, e.g. "NPZ"."""
+    return FORMAT_NAMES[Path(path).suffix]
+
+
+def benchmark_array_formats(
+    array: np.ndarray, formats: dict = None, repeats: int = 3
+) -> List[dict]:
+    """Compare the file size with the encoding and decoding time of the array formats.
+
+    Args:
+        array: Array to benchmark, e.g. a loaded PixelAnnotation output.
+        formats: Compression levels to test per format. Defaults to the default level of every format.
+        repeats: Number of repetitions. The fastest run is reported.
+
+    Returns:
+        List[dict]: One result per format and level. Formats with missing dependencies are skipped.
+    """
+    if formats is None:
+        formats = {name: [None] for name in ARRAY_FORMATS}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for array_format, levels in formats.items():
+            for level in levels:
+                encode_times, decode_times = [], []
+                try:
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        path = save_array(
+                            str(Path(tmp_dir) / "array"), array, array_format, level
+                        )
+                        encode_times.append(time.perf_counter() - start)
+                        start = time.perf_counter()
+                        load_array(path, mmap=False)
+                        decode_times.append(time.perf_counter() - start)
+                except ImportError:
+                    continue
+                results.append(
+                    {
+                        "format": array_format,
+                        "level": level
+                        if level is not None
+                        else DEFAULT_COMPRESSION_LEVELS.get(array_format),
+                        "size_mb": Path(path).stat().st_size / 1024**2,
+                        "encode_s": min(encode_times),
+                        "decode_s": min(decode_times),
+                    }
+                )
+    return results
+
+
+if __name__ == "__main__":
+    from rich.console import Console
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark the array formats on existing output files"
+    )
+    parser.add_argument("files", nargs="+", help="Array files, e.g. depth or pointcloud outputs")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    console = Console()
+    for file in args.files:
+        array = np.asarray(load_array(file))
+        table = Table(
+            title=f"{file} {array.shape} {array.dtype} {array.nbytes / 1024**2:.1f} MB"
+        )
+        for column in ["Format", "Level", "Size [MB]", "Encode [s]", "Decode [s]"]:
+            table.add_column(column)
+        for result in benchmark_array_formats(array, repeats=args.repeats):
+            table.add_row(
+                result["format"],
+                str(result["level"]),
+                f'{result["size_mb"]:.2f}',
+                f'{result["encode_s"]:.3f}',
+                f'{result["decode_s"]:.3f}',
+            )
+        console.print(table)
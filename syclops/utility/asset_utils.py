@@ -2,7 +2,6 @@ import glob
 import hashlib
 import inspect
 import logging
-import pickle
 import sys
 from importlib import util
 from os.path import isdir, splitext
@@ -15,6 +14,8 @@ import numpy as np
 
 import pkg_resources
 
+from .blender_utils import get_catalog
+
 
 def load_plugins():
     entry_points = [
@@ -191,8 +192,7 @@ def get_asset(asset_name: str) -> dict:
     Returns:
         dict: Asset
     """
-    catalog_string = bpy.data.scenes["Scene"]["catalog"]
-    catalog = pickle.loads(bytes(catalog_string, "latin1"))
+    catalog = get_catalog()
 
     library, asset = split_asset_name(asset_name)
     if library in catalog and asset in catalog[library]["assets"]:
@@ -351,8 +351,7 @@ def import_file(obj_path: str, imported_objs: List[bpy.types.Object]):
 
 def get_lib_path(asset_name: str) -> str:
     """Get library path from catalog"""
-    catalog_string = bpy.data.scenes["Scene"]["catalog"]
-    catalog = pickle.loads(bytes(catalog_string, "latin1"))
+    catalog = get_catalog()
 
     library, _ = split_asset_name(asset_name)
     return catalog[library]["root_path"]
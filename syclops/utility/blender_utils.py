@@ -1,8 +1,11 @@
+import hashlib
 import logging
 import pickle
+import time
 import uuid
 from pathlib import Path
-from typing import Union, List
+from collections import OrderedDict
+from typing import Union, List, Tuple
 
 import bmesh
 import bpy
@@ -10,6 +13,30 @@ import coacd
 import numpy as np
 from mathutils import Matrix
 from . import sampling_utils as su
+from .general_utils import DEFAULT_HASH_SCHEME, get_rss
+
+REVERT_MODES = ["undo", "snapshot"]
+DEFAULT_REVERT_MODE = "undo"
+# Scene structs whose settings are restored by a snapshot, as data paths from the scene
+SNAPSHOT_SCENE_SETTINGS = ["", "render", "render.image_settings", "cycles", "view_settings"]
+# Collections of bpy.data whose datablocks without users are removed by collect_garbage
+GC_DATA_COLLECTIONS = ["meshes", "materials", "images", "textures", "node_groups"]
+DEFAULT_GC_INTERVAL = 10
+
+# Collections of bpy.data whose added datablocks are removed by a snapshot, objects first
+SNAPSHOT_DATA_COLLECTIONS = [
+    "objects",
+    "meshes",
+    "curves",
+    "lights",
+    "cameras",
+    "materials",
+    "node_groups",
+    "textures",
+    "images",
+    "worlds",
+    "collections",
+]
 
 
 def apply_transform(
@@ -95,6 +122,7 @@ def clear_scene() -> None:
     """Clear the scene of all objects."""
     bpy.ops.object.select_all(action="SELECT")
     bpy.ops.object.delete()
+    invalidate_object_index()
 
 
 def set_seeds(seeds: dict) -> None:
@@ -107,14 +135,74 @@ def set_seeds(seeds: dict) -> None:
     bpy.context.scene.cycles.seed = seeds["cycles"]
 
 
+# Unpickled scene properties by name, together with their version id
+_scene_dict_cache = {}
+
+
+def set_scene_dict(key: str, value: dict):
+    """Store a dict pickled in a property of the scene.
+
+    A new version id is written together with the property, so readers can detect the
+    change without comparing the pickled strings.
+
+    Args:
+        key: Name of the scene property, e.g. "catalog" or "job_description".
+        value: Dict to store.
+    """
+    scene = bpy.data.scenes["Scene"]
+    scene[key] = str(pickle.dumps(value), encoding="latin1")
+    scene[f"{key}_version"] = uuid.uuid4().hex
+
+
+def get_scene_dict(key: str) -> dict:
+    """Get a dict that is stored pickled in a property of the scene.
+
+    The dict is only unpickled again if the version id written by set_scene_dict changed.
+    Properties without a version id are compared as strings. The dict is shared by all
+    callers and must not be modified.
+
+    Args:
+        key: Name of the scene property, e.g. "catalog" or "job_description".
+
+    Returns:
+        dict: The unpickled dict.
+    """
+    scene = bpy.data.scenes["Scene"]
+    version = scene.get(f"{key}_version")
+    if version is None:
+        version = scene[key]
+    cached = _scene_dict_cache.get(key)
+    if cached is None or cached[0] != version:
+        cached = (version, pickle.loads(bytes(scene[key], "latin1")))
+        _scene_dict_cache[key] = cached
+    return cached[1]
+
+
 def get_job_conf() -> dict:
     """Get the job configuration from the scene.
 
     Returns:
-        dict: Job configuration.
+        dict: Job configuration. Shared by all callers, it must not be modified.
+    """
+    return get_scene_dict("job_description")
+
+
+def get_catalog() -> dict:
+    """Get the asset catalog from the scene.
+
+    Returns:
+        dict: Catalog. Shared by all callers, it must not be modified.
+    """
+    return get_scene_dict("catalog")
+
+
+def get_instance_id_hash() -> str:
+    """Get the hash function of the instance ids of the job.
+
+    Returns:
+        str: "sha256" or "splitmix64".
     """
-    job_string = bpy.data.scenes["Scene"]["job_description"]
-    return pickle.loads(bytes(job_string, "latin1"))
+    return get_job_conf().get("instance_id_hash", DEFAULT_HASH_SCHEME)
 
 
 def append_output_path(path: Union[str, Path], set_blend_path: bool = True) -> Path:
@@ -134,8 +222,10 @@ def append_output_path(path: Union[str, Path], set_blend_path: bool = True) -> P
     return base_path / path
 
 
-def configure_render():
-    """Set Blender rendering settings.
+def configure_render_devices():
+    """Configure the Cycles render device and compute hardware of the job.
+
+    Refreshing the devices enumerates the hardware, so this is done once per job.
 
     Raises:
         TypeError: If the render device or hardware is not supported.
@@ -168,6 +258,37 @@ def configure_render():
     addons["cycles"].preferences.refresh_devices()
 
 
+def configure_render():
+    """Set Blender rendering settings.
+
+    The devices are configured once by configure_render_devices, only the render
+    engine and device of the scene are reset if an output changed them.
+    """
+    apply_render_settings(
+        {
+            "render.engine": "CYCLES",
+            "cycles.device": get_job_conf()["render_device"],
+        }
+    )
+
+
+def apply_render_settings(settings: dict):
+    """Set render settings of the scene that differ from the current values.
+
+    Args:
+        settings: Values by data path from the scene, e.g. {"cycles.samples": 64}.
+
+    Raises:
+        TypeError: If a value is not supported by the setting.
+    """
+    scene = bpy.context.scene
+    for path, value in settings.items():
+        owner_path, _, attr = path.rpartition(".")
+        owner = scene.path_resolve(owner_path) if owner_path else scene
+        if getattr(owner, attr) != value:
+            setattr(owner, attr, value)
+
+
 def render_visibility(obj: bpy.types.Object) -> bool:
     """Return the visibility of the object in the scene.
 
@@ -209,9 +330,40 @@ def set_active_collection(collection: bpy.types.Collection):
     bpy.context.view_layer.active_layer_collection = layer_collection
 
 
+# Object names by UUID, validated on every lookup
+_uuid_index = {}
+# Per custom attribute: number of objects when it was built and object names by value
+_attribute_index = {}
+
+
+def _index_key(value):
+    """Hashable key of a custom property value."""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def _build_attribute_index(filter_attribute: str) -> dict:
+    """Scan all objects once and index their names by the value of an attribute."""
+    index = {}
+    for obj in bpy.data.objects:
+        value = obj.get(filter_attribute)
+        if value is not None:
+            index.setdefault(_index_key(value), []).append(obj.name)
+    _attribute_index[filter_attribute] = (len(bpy.data.objects), index)
+    return index
+
+
 def filter_objects(filter_attribute: str, filter_value: str) -> list[bpy.types.Object]:
     """Filter objects based on a custom attribute.
 
+    The objects are indexed by the attribute value. The index is rebuilt if the number
+    of objects changed or an indexed object was renamed, removed or changed its value.
+    Code that adds, removes or tags objects calls invalidate_object_index, e.g. the
+    write_config of plugins and sensors, convex_decomposition and RevertAfter.
+
     Args:
         filter_attribute (str): Name of the custom attribute to filter by.
         filter_value (str): Value of the custom attribute to filter by.
@@ -219,33 +371,107 @@ def filter_objects(filter_attribute: str, filter_value: str) -> list[bpy.types.O
     Returns:
         list: List of objects matching the filter.
     """
-    filtered_objs = []
-    for obj in bpy.data.objects:
-        if obj.get(filter_attribute) == filter_value:
+    num_objects, index = _attribute_index.get(filter_attribute, (None, None))
+    if num_objects != len(bpy.data.objects):
+        index = _build_attribute_index(filter_attribute)
+    for _ in range(2):
+        filtered_objs = []
+        for name in index.get(_index_key(filter_value), []):
+            obj = bpy.data.objects.get(name)
+            if obj is None or obj.get(filter_attribute) != filter_value:
+                break
             filtered_objs.append(obj)
+        else:
+            return filtered_objs
+        index = _build_attribute_index(filter_attribute)
     return filtered_objs
 
 
-def load_img_as_array(path: str) -> np.ndarray:
+def find_object_by_uuid(obj_uuid: str) -> Union[bpy.types.Object, None]:
+    """Find the object with a UUID written by ObjPointer.
+
+    The name of the object is looked up in an index. Only if the object was renamed or
+    removed, all objects are scanned and the index is updated.
+
+    Args:
+        obj_uuid (str): UUID of the object.
+
+    Returns:
+        Union[bpy.types.Object, None]: The object, None if no object has the UUID.
+    """
+    obj = bpy.data.objects.get(_uuid_index.get(obj_uuid, ""))
+    if obj is not None and obj.get("UUID") == obj_uuid:
+        return obj
+    found = None
+    for obj in bpy.data.objects:
+        other_uuid = obj.get("UUID")
+        if other_uuid is not None:
+            # Copies share the UUID, the first object is returned like in the scan
+            if other_uuid not in _uuid_index or other_uuid == obj_uuid and found is None:
+                _uuid_index[other_uuid] = obj.name
+            if other_uuid == obj_uuid and found is None:
+                found = obj
+    return found
+
+
+def invalidate_object_index(attributes: List[str] = None):
+    """Rebuild the object indices of filter_objects and find_object_by_uuid on next use.
+
+    Args:
+        attributes (List[str], optional): Custom attributes that were added or changed.
+            Defaults to None, which rebuilds all indices.
+    """
+    if attributes is None:
+        _uuid_index.clear()
+        _attribute_index.clear()
+        return
+    for attribute in attributes:
+        _attribute_index.pop(attribute, None)
+
+
+# Reusable float32 pixel buffers of load_img_as_array, one per image shape
+_pixel_buffers = {}
+
+
+def load_img_as_array(path: str, reuse_buffer: bool = False) -> np.ndarray:
     """Load image as numpy array.
 
+    The pixels are copied with foreach_get directly into a float32 array, instead of
+    creating a Python float for every pixel value. The Blender image is removed afterwards.
+
     Args:
         path (str): Path to image
+        reuse_buffer (bool, optional): Copy the pixels into a buffer that is shared by all calls
+            with the same image shape. The returned array is overwritten by the next call.
+            Defaults to False.
 
     Returns:
-        np.ndarray: Image as numpy array
+        np.ndarray: Image as float32 numpy array
     """
     out_data = bpy.data.images.load(path)
     width, height = out_data.size
-    img = np.array(out_data.pixels[:])
-    img.resize((height, width, out_data.channels))
+    shape = (height, width, out_data.channels)
+    if reuse_buffer:
+        if shape not in _pixel_buffers:
+            _pixel_buffers[shape] = np.empty(shape, dtype=np.float32)
+        img = _pixel_buffers[shape]
+    else:
+        img = np.empty(shape, dtype=np.float32)
+    out_data.pixels.foreach_get(img.reshape(-1))
+    bpy.data.images.remove(out_data)
     return np.flip(img, 0)
 
 
+# Image names by path, from least to most recently requested
+_image_index = OrderedDict()
+
+
 def load_image(path: str) -> bpy.types.Image:
     """Load image from path.
 
     Checks if an image with the same path is already loaded and returns it if so.
+    The image is looked up by path in an index, all images are only scanned if it
+    was renamed or removed.
 
     Args:
         path (str): Path to image.
@@ -253,13 +479,87 @@ def load_image(path: str) -> bpy.types.Image:
     Returns:
         bpy.types.Image: Image.
     """
-    for image in bpy.data.images:
-        if image.get("PATH") == str(path):
-            return image
+    path = str(path)
+    image = bpy.data.images.get(_image_index.get(path, ""))
+    if image is None or image.get("PATH") != path:
+        image = next((img for img in bpy.data.images if img.get("PATH") == path), None)
+        if image is None:
+            image = bpy.data.images.load(path)
+            image["PATH"] = path
+    _image_index[path] = image.name
+    _image_index.move_to_end(path)
+    return image
+
+
+def get_image_texture(name: str, image: bpy.types.Image) -> bpy.types.Texture:
+    """Get an image texture by name and assign an image to it.
+
+    The texture is created once and reused, instead of adding a texture per call.
+    Modifiers that use the texture do not count as users, so it gets a fake user to
+    keep it from being removed by collect_garbage.
+
+    Args:
+        name (str): Name of the texture.
+        image (bpy.types.Image): Image of the texture.
+
+    Returns:
+        bpy.types.Texture: Image texture.
+    """
+    texture = bpy.data.textures.get(name)
+    if texture is None or texture.type != "IMAGE":
+        texture = bpy.data.textures.new(name, type="IMAGE")
+        texture.use_fake_user = True
+    if texture.image != image:
+        texture.image = image
+    return texture
+
+
+def _image_memory(image: bpy.types.Image) -> int:
+    """Size of the loaded pixels of an image in bytes, 0 if they are not loaded."""
+    if not image.has_data:
+        return 0
+    width, height = image.size
+    return width * height * image.channels * (4 if image.is_float else 1)
+
+
+def image_memory() -> Tuple[int, int]:
+    """Memory of the images whose pixels are loaded.
+
+    Returns:
+        Tuple[int, int]: Size in bytes and number of loaded images.
+    """
+    sizes = [_image_memory(image) for image in bpy.data.images]
+    return sum(sizes), sum(size > 0 for size in sizes)
+
 
-    loaded_img = bpy.data.images.load(str(path))
-    loaded_img["PATH"] = str(path)
-    return loaded_img
+def evict_images(memory_budget: float) -> int:
+    """Remove unused images of load_image until the images fit in a memory budget.
+
+    Images without users are removed, least recently requested first. Images that
+    are still used are never removed.
+
+    Args:
+        memory_budget (float): Budget of the loaded images in MB.
+
+    Returns:
+        int: Number of removed images.
+    """
+    memory, _ = image_memory()
+    budget = memory_budget * 1024**2
+    removed = 0
+    for path, name in list(_image_index.items()):
+        if memory <= budget:
+            break
+        image = bpy.data.images.get(name)
+        if image is None or image.get("PATH") != path:
+            del _image_index[path]
+            continue
+        if image.users == 0:
+            memory -= _image_memory(image)
+            bpy.data.images.remove(image)
+            del _image_index[path]
+            removed += 1
+    return removed
 
 
 class ObjPointer(object):
@@ -300,9 +600,12 @@ class ObjPointer(object):
         """
         if self.type == "OBJECT":
             if "UUID" in obj:
+                _uuid_index.setdefault(obj["UUID"], obj.name)
                 return obj["UUID"]
             ob_id = str(uuid.uuid4())
             obj["UUID"] = ob_id
+            _uuid_index[ob_id] = obj.name
+            invalidate_object_index(["UUID"])
         elif self.type == "COLLECTION":
             ob_id = obj.name
         return ob_id
@@ -317,24 +620,226 @@ class ObjPointer(object):
             ValueError: If object with uuid is not found.
         """
         if self.type == "OBJECT":
-            for obj in bpy.data.objects:
-                if obj.get("UUID") == self.uuid:
-                    return obj
+            obj = find_object_by_uuid(self.uuid)
+            if obj is not None:
+                return obj
         elif self.type == "COLLECTION":
-            for collection in bpy.data.collections:
-                if collection.name == self.uuid:
-                    return collection
+            collection = bpy.data.collections.get(self.uuid)
+            if collection is not None:
+                return collection
         err_msg = "Object with UUID {0} not found".format(self.uuid)
         logging.error(err_msg)
         raise ValueError(err_msg)
 
 
+def get_revert_mode() -> str:
+    """Get the mode of RevertAfter contexts of the job.
+
+    Returns:
+        str: "undo" or "snapshot". "undo" outside of a job.
+    """
+    try:
+        return get_job_conf().get("revert_mode", DEFAULT_REVERT_MODE)
+    except KeyError:
+        return DEFAULT_REVERT_MODE
+
+
+def _copy_value(value):
+    """Copy an RNA property value, so later changes of the property do not alter it."""
+    if isinstance(value, set):
+        return set(value)
+    if not isinstance(value, (str, bpy.types.bpy_struct)) and hasattr(value, "__iter__"):
+        return tuple(value)
+    return value
+
+
+class SceneSnapshot(object):
+    """Record the parts of the scene state that outputs change and restore them explicitly.
+
+    On creation, the snapshot stores the settings of the scene structs in
+    SNAPSHOT_SCENE_SETTINGS, the custom property keys of the scene, the compositor nodes
+    and links, the AOVs of the view layer and the names of the datablocks in
+    SNAPSHOT_DATA_COLLECTIONS. Restoring it resets the settings and removes everything
+    that was added. Other changes have to be recorded before they are made, see
+    record_state. Removed datablocks and nodes can not be restored.
+    """
+
+    def __init__(self):
+        scene = bpy.context.scene
+        self.scene = scene
+        self.view_layer = bpy.context.view_layer
+        self.values = {}
+        self.node_trees = {}
+        for path in SNAPSHOT_SCENE_SETTINGS:
+            struct = scene.path_resolve(path) if path else scene
+            self.record(struct, *self._settings(struct))
+        self.scene_keys = set(scene.keys())
+        if scene.node_tree is None:
+            # Create the compositor tree, so nodes added to it can be removed again
+            scene.use_nodes = True
+        self.record_node_tree(scene.node_tree)
+        self.num_aovs = len(self.view_layer.aovs)
+        self.datablocks = {
+            name: set(getattr(bpy.data, name).keys())
+            for name in SNAPSHOT_DATA_COLLECTIONS
+        }
+
+    @staticmethod
+    def _settings(struct) -> List[str]:
+        """Names of the writable properties of a struct."""
+        return [
+            prop.identifier
+            for prop in struct.bl_rna.properties
+            if not prop.is_readonly
+            and prop.type != "COLLECTION"
+            and prop.identifier != "rna_type"
+        ]
+
+    @staticmethod
+    def _links(node_tree) -> set:
+        """Links of a node tree as node names and socket identifiers."""
+        return {
+            (
+                link.from_node.name,
+                link.from_socket.identifier,
+                link.to_node.name,
+                link.to_socket.identifier,
+            )
+            for link in node_tree.links
+        }
+
+    def record(self, owner, *attrs):
+        """Record attributes of a struct before they are changed.
+
+        Args:
+            owner: Struct, e.g. an object or a node socket.
+            *attrs: Names of the attributes. The first recorded value is restored.
+        """
+        for attr in attrs:
+            key = (owner.as_pointer(), attr)
+            if key not in self.values:
+                self.values[key] = (owner, attr, _copy_value(getattr(owner, attr)))
+
+    def record_node_tree(self, node_tree):
+        """Record the nodes and links of a node tree before they are changed.
+
+        Args:
+            node_tree: Node tree. Added nodes are removed and the links are restored.
+        """
+        key = node_tree.as_pointer()
+        if key not in self.node_trees:
+            self.node_trees[key] = (
+                node_tree,
+                set(node_tree.nodes.keys()),
+                self._links(node_tree),
+            )
+
+    def restore(self):
+        """Restore the recorded state and remove added nodes, AOVs and datablocks."""
+        for owner, attr, value in self.values.values():
+            if _copy_value(getattr(owner, attr)) != value:
+                setattr(owner, attr, value)
+
+        for node_tree, node_names, links in self.node_trees.values():
+            for node in [n for n in node_tree.nodes if n.name not in node_names]:
+                node_tree.nodes.remove(node)
+            current_links = self._links(node_tree)
+            for link in list(node_tree.links):
+                key = (
+                    link.from_node.name,
+                    link.from_socket.identifier,
+                    link.to_node.name,
+                    link.to_socket.identifier,
+                )
+                if key not in links:
+                    node_tree.links.remove(link)
+            for from_node, from_socket, to_node, to_socket in links - current_links:
+                outputs = node_tree.nodes[from_node].outputs
+                inputs = node_tree.nodes[to_node].inputs
+                node_tree.links.new(
+                    next(s for s in outputs if s.identifier == from_socket),
+                    next(s for s in inputs if s.identifier == to_socket),
+                )
+
+        # AOVs are appended to the view layer
+        while len(self.view_layer.aovs) > self.num_aovs:
+            self.view_layer.active_aov_index = len(self.view_layer.aovs) - 1
+            bpy.ops.scene.view_layer_remove_aov()
+
+        for key in set(self.scene.keys()) - self.scene_keys:
+            del self.scene[key]
+
+        for name in SNAPSHOT_DATA_COLLECTIONS:
+            collection = getattr(bpy.data, name)
+            for block_name in set(collection.keys()) - self.datablocks[name]:
+                block = collection[block_name]
+                # Keep the render result images
+                if name == "images" and block.type in ("RENDER_RESULT", "COMPOSITING"):
+                    continue
+                collection.remove(block)
+
+
+_active_snapshots = []
+_active_revert_modes = []
+
+
+def record_state(owner, *attrs):
+    """Record attributes before changing them, so active snapshots restore them.
+
+    Does nothing if no RevertAfter context in snapshot mode is active.
+
+    Args:
+        owner: Struct, e.g. an object or a node socket.
+        *attrs: Names of the attributes.
+    """
+    for snapshot in _active_snapshots:
+        snapshot.record(owner, *attrs)
+
+
+def record_node_tree(node_tree):
+    """Record the nodes and links of a node tree before changing them, see record_state.
+
+    Args:
+        node_tree: Node tree.
+    """
+    for snapshot in _active_snapshots:
+        snapshot.record_node_tree(node_tree)
+
+
 class RevertAfter(object):
-    """Context manager to revert changes after execution."""
+    """Context manager to revert changes after execution.
+
+    In "undo" mode, the whole main database is stored in an undo step. In "snapshot"
+    mode, only the state of a SceneSnapshot is restored, without storing the whole
+    database. This requires that all other changes are recorded with record_state.
+
+    Args:
+        mode (str, optional): "undo" or "snapshot". Defaults to the mode of the enclosing
+            context or, outside of other contexts, to the revert_mode of the job.
+    """
+
+    def __init__(self, mode: str = None):
+        if mode is not None and mode not in REVERT_MODES:
+            raise ValueError(f"Unknown revert mode {mode}. Use one of {REVERT_MODES}")
+        self.mode = mode
+        self.snapshot = None
 
     def __enter__(self):
         """Save the current state of the scene."""
-        bpy.ops.ed.undo_push()
+        mode = self.mode
+        if mode is None:
+            mode = _active_revert_modes[-1] if _active_revert_modes else get_revert_mode()
+        if mode == "snapshot":
+            self.snapshot = SceneSnapshot()
+            _active_snapshots.append(self.snapshot)
+        else:
+            if _active_snapshots:
+                # Undo would invalidate the Python references of the snapshot
+                raise RuntimeError(
+                    "RevertAfter can not use undo inside of a snapshot context"
+                )
+            bpy.ops.ed.undo_push()
+        _active_revert_modes.append(mode)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Revert changes if no exception was raised.
@@ -344,10 +849,139 @@ class RevertAfter(object):
             exc_val: Exception value.
             exc_tb: Exception traceback.
         """
+        _active_revert_modes.pop()
+        if self.snapshot is not None:
+            _active_snapshots.remove(self.snapshot)
+            if exc_type is None:
+                self.snapshot.restore()
         # If no exception was raised, revert changes
-        if exc_type is None:
+        elif exc_type is None:
             bpy.ops.ed.undo_push()
             bpy.ops.ed.undo()
+        # Objects of the context were removed or restored
+        invalidate_object_index()
+
+
+class RenderTimer(object):
+    """Measure the sync and sampling time of every render with render handlers.
+
+    The sync time lasts from the start of a render until Cycles reports the first
+    sample, it includes the scene synchronization and the BVH build. The sampling time
+    lasts from the first sample until the render finished.
+    """
+
+    def __init__(self):
+        self.renders = []
+        self._start = None
+        self._sampling_start = None
+
+    def register(self):
+        """Add the render handlers."""
+        bpy.app.handlers.render_pre.append(self._on_render_pre)
+        bpy.app.handlers.render_stats.append(self._on_render_stats)
+        bpy.app.handlers.render_post.append(self._on_render_post)
+
+    def unregister(self):
+        """Remove the render handlers."""
+        for handlers, handler in (
+            (bpy.app.handlers.render_pre, self._on_render_pre),
+            (bpy.app.handlers.render_stats, self._on_render_stats),
+            (bpy.app.handlers.render_post, self._on_render_post),
+        ):
+            if handler in handlers:
+                handlers.remove(handler)
+
+    def summary(self) -> dict:
+        """Mean sync and sampling time of all renders.
+
+        Returns:
+            dict: Number of renders and mean durations in seconds.
+        """
+        if not self.renders:
+            return {"renders": 0}
+        return {
+            "renders": len(self.renders),
+            "sync_s": float(np.mean([r["sync_s"] for r in self.renders])),
+            "sampling_s": float(np.mean([r["sampling_s"] for r in self.renders])),
+        }
+
+    def _on_render_pre(self, *args):
+        self._start = time.perf_counter()
+        self._sampling_start = None
+
+    def _on_render_stats(self, stats, *args):
+        if self._sampling_start is None and "Sample " in str(stats):
+            self._sampling_start = time.perf_counter()
+
+    def _on_render_post(self, scene, *args):
+        if self._start is None:
+            return
+        end = time.perf_counter()
+        sampling_start = self._sampling_start or end
+        render = {
+            "frame": scene.frame_current,
+            "camera": scene.camera.get("name") if scene.camera else None,
+            "sync_s": sampling_start - self._start,
+            "sampling_s": end - sampling_start,
+        }
+        self.renders.append(render)
+        self._start = None
+        logging.info(
+            "Render of %s at frame %d: sync %.3f s, sampling %.3f s",
+            render["camera"],
+            render["frame"],
+            render["sync_s"],
+            render["sampling_s"],
+        )
+
+
+def collect_garbage(aggressive: bool = False) -> int:
+    """Remove datablocks without users from the collections of GC_DATA_COLLECTIONS.
+
+    Datablocks with a fake user and datablocks linked from libraries are kept.
+    Removing a datablock can leave others without users, e.g. the images of a
+    material, so the collections are purged until nothing is left to remove.
+
+    Args:
+        aggressive (bool, optional): Purge unused local datablocks of all types.
+            Defaults to False.
+
+    Returns:
+        int: Number of removed datablocks.
+    """
+    removed = 0
+    if aggressive:
+        removed += bpy.data.orphans_purge(
+            do_local_ids=True, do_linked_ids=False, do_recursive=True
+        )
+    while True:
+        removed_pass = 0
+        for name in GC_DATA_COLLECTIONS:
+            collection = getattr(bpy.data, name)
+            for block in [
+                b
+                for b in collection
+                if b.users == 0 and not b.use_fake_user and b.library is None
+            ]:
+                collection.remove(block)
+                removed_pass += 1
+        removed += removed_pass
+        if removed_pass == 0:
+            return removed
+
+
+def memory_telemetry() -> dict:
+    """Resident memory of the process and the number of datablocks per collection.
+
+    Returns:
+        dict: "rss_mb" (None if unknown) and the count of objects and of every
+            collection of GC_DATA_COLLECTIONS.
+    """
+    rss = get_rss()
+    telemetry = {"rss_mb": None if rss is None else round(rss / 1024**2, 1)}
+    for name in ["objects"] + GC_DATA_COLLECTIONS:
+        telemetry[name] = len(getattr(bpy.data, name))
+    return telemetry
 
 
 def _get_bounding_box(tmp_obj):
@@ -460,6 +1094,7 @@ def convex_decomposition(
         convex_obj.scale = obj.scale
         convex_hulls.append(convex_obj)
 
+    invalidate_object_index(["PARENT_UUID"])
     return convex_hulls
 
 
@@ -646,10 +1281,89 @@ def load_from_blend(
     return data_to_return
 
 
+# Raw mesh volumes in m^3 by geometry hash
+_volume_cache = {}
+# Node group shared by the volume attribute modifiers of all objects
+VOLUME_NODE_GROUP = "Volume_Attribute"
+
+
+def geometry_hash(mesh: bpy.types.Mesh) -> str:
+    """Hash of the vertex positions and faces of a mesh.
+
+    Args:
+        mesh (bpy.types.Mesh): Mesh to hash.
+
+    Returns:
+        str: Hash that changes if the geometry of the mesh is edited.
+    """
+    coordinates = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coordinates)
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    geometry = hashlib.blake2b(digest_size=16)
+    for array in (coordinates, loop_vertices, loop_totals):
+        geometry.update(np.int64(array.size).tobytes())
+        geometry.update(array.tobytes())
+    return geometry.hexdigest()
+
+
+def mesh_volume(mesh: bpy.types.Mesh) -> float:
+    """Volume of a mesh without the object's scale, memoized by geometry hash.
+
+    The geometry is hashed on every call, so edited meshes get a new volume.
+
+    Args:
+        mesh (bpy.types.Mesh): Mesh to calculate the volume of.
+
+    Returns:
+        float: Volume in m^3.
+    """
+    key = geometry_hash(mesh)
+    if key not in _volume_cache:
+        bm = bmesh.new()
+        bm.from_mesh(mesh)
+        _volume_cache[key] = float(bm.calc_volume())
+        bm.free()
+    return _volume_cache[key]
+
+
+def _get_volume_node_group() -> bpy.types.NodeTree:
+    """Get the node group that stores its volume input as attribute, create it if missing."""
+    node_group = bpy.data.node_groups.get(VOLUME_NODE_GROUP)
+    if node_group is not None and "Volume" in node_group.inputs:
+        return node_group
+
+    node_group = bpy.data.node_groups.new(VOLUME_NODE_GROUP, "GeometryNodeTree")
+    input_node = node_group.nodes.new("NodeGroupInput")
+    output_node = node_group.nodes.new("NodeGroupOutput")
+
+    node_group.outputs.new("NodeSocketGeometry", "Geometry")
+    node_group.inputs.new("NodeSocketGeometry", "Geometry")
+    node_group.inputs.new("NodeSocketFloat", "Volume")
+
+    # Add attribute node
+    attribute_node = node_group.nodes.new("GeometryNodeStoreNamedAttribute")
+    attribute_node.inputs["Name"].default_value = "volume"
+    attribute_node.name = "Volume"
+
+    # Add links
+    node_group.links.new(
+        input_node.outputs["Geometry"],
+        attribute_node.inputs["Geometry"],
+    )
+    node_group.links.new(input_node.outputs["Volume"], attribute_node.inputs[4])
+    node_group.links.new(attribute_node.outputs["Geometry"], output_node.inputs[0])
+    return node_group
+
+
 def add_volume_attribute(obj: bpy.types.Object):
     """Add a volume attribute to an object.
 
     Create geometry nodes modifier to write an attribute containing the volume of the object.
+    The volume of the mesh is cached and all objects share the node group of the modifier,
+    the volume is set as input of the modifier.
 
     Args:
         obj (bpy.types.Object): Object to add volume attribute to.
@@ -657,56 +1371,30 @@ def add_volume_attribute(obj: bpy.types.Object):
     # Convert to cm^3 from m^3
     volume_conversion_factor = 1000000
 
-    bm = bmesh.new()
-    bm.from_mesh(obj.data)
     # Calculate the raw volume (without considering scaling)
-    raw_volume = float(bm.calc_volume())
+    raw_volume = mesh_volume(obj.data)
 
     # Calculate the scale factor (product of the scale on all axes)
     scale_factor = obj.scale.x * obj.scale.y * obj.scale.z
     # Adjust the volume for the object's scaling
     volume = raw_volume * scale_factor * volume_conversion_factor
 
-    # Remove bmesh
-    bm.free()
-    bm = None
-
-    if "Volume_Attribute" in obj.modifiers:
-        obj.modifiers["Volume_Attribute"].node_group.nodes["Volume"].inputs[
-            4
-        ].default_value = volume
-    else:
+    node_group = _get_volume_node_group()
+    attribute_mod = obj.modifiers.get("Volume_Attribute")
+    if attribute_mod is None:
         # Add geometry nodes to object
         attribute_mod = obj.modifiers.new(
             "Volume_Attribute",
             "NODES",
         )
-
-        # Add node group to modifier
-        node_group = bpy.data.node_groups.new(
-            "Attribute",
-            "GeometryNodeTree",
-        )
+    if attribute_mod.node_group != node_group:
         attribute_mod.node_group = node_group
 
-        input_node = node_group.nodes.new("NodeGroupInput")
-        output_node = node_group.nodes.new("NodeGroupOutput")
-
-        node_group.outputs.new("NodeSocketGeometry", "Geometry")
-        node_group.inputs.new("NodeSocketGeometry", "Geometry")
-
-        # Add attribute node
-        attribute_node = node_group.nodes.new("GeometryNodeStoreNamedAttribute")
-        attribute_node.inputs["Name"].default_value = "volume"
-        attribute_node.inputs[4].default_value = volume
-        attribute_node.name = "Volume"
-
-        # Add links
-        node_group.links.new(
-            input_node.outputs["Geometry"],
-            attribute_node.inputs["Geometry"],
-        )
-        node_group.links.new(attribute_node.outputs["Geometry"], output_node.inputs[0])
+    volume_input = node_group.inputs["Volume"].identifier
+    if attribute_mod.get(volume_input) != volume:
+        attribute_mod[volume_input] = volume
+        # Modifier inputs set as ID properties do not trigger a reevaluation
+        obj.update_tag()
 
 
 def refresh_modifiers():
@@ -719,6 +1407,7 @@ def refresh_modifiers():
                 mod.show_viewport = True
                 bpy.context.view_layer.update()
             elif render_visibility(obj):
+                record_state(mod, "show_viewport")
                 mod.show_viewport = True
                 bpy.context.view_layer.update()
 
@@ -832,8 +1521,7 @@ def eval_param(eval_params: Union[float, dict, str]) -> Union[float, list, str]:
     eval_params = eval_params if is_list else [eval_params]
 
     curr_frame = bpy.context.scene.frame_current
-    catalog_string = bpy.data.scenes["Scene"]["catalog"]
-    catalog = pickle.loads(bytes(catalog_string, "latin1"))
+    catalog = get_catalog()
 
     evaluated_param = list(
         map(lambda x: su.apply_sampling(x, curr_frame, catalog), eval_params)
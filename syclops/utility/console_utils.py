@@ -3,19 +3,21 @@ import threading
 import time
 from pathlib import Path
 
-import ruamel.yaml as yaml
-from filelock import FileLock
 from rich.console import Console, Group
 from rich.live import Live
 from rich.panel import Panel
 from rich.progress import MofNCompleteColumn, Progress
 from rich.status import Status
 
+from .event_utils import FALLBACK_SCAN_INTERVAL, StepEventSubscriber
+from .metadata_utils import StepJournalReader, find_metadata_files
+
 
 class ProgressTracker:
     def __init__(self, folder):
         self.folder = folder
         self.output_dicts = {}
+        self.readers = {}
         self.color_index = 0
         self.colors = ["[yellow]", "[red]", "[green]", "[magenta]", "[cyan]", "[blue]"]
 
@@ -38,6 +40,11 @@ class ProgressTracker:
                 errors_string += error
             console.print(Panel(errors_string, title="[red bold] ERRORS"))
 
+    def add_reader(self, metadata_file):
+        metadata_file = os.path.abspath(metadata_file)
+        if metadata_file not in self.readers:
+            self.readers[metadata_file] = StepJournalReader(metadata_file)
+
     def check_errors(self):
         # Check for errors in the logs and return all lines after the first "error"
         try:
@@ -54,6 +61,9 @@ class ProgressTracker:
         main_status = Status("Waiting for first generated data")
         log_status = Status("Waiting for logs", spinner="earth")
         prog_bar_dict = {}
+        subscriber = StepEventSubscriber.from_environment()
+        last_scan = 0.0
+        changed_files = set()
         with Live(Panel(Group(main_status, Panel(log_status, title="LAST LOG")))) as lv:
             while self.running:
                 curr_blender_samples = ""
@@ -81,16 +91,22 @@ class ProgressTracker:
                         log_status.update(lines[-1][:-1] + curr_blender_samples)
                 except FileNotFoundError:
                     pass
-                # Scan the folder and its subfolders
-                for root, dirs, files in os.walk(self.folder):
-                    metadata_files = [f for f in files if f.endswith("metadata.yaml")]
-                    for file in metadata_files:
-                        # Acquire a lock on the file
-                        lock = FileLock(os.path.join(root, file + ".lock"))
-                        with lock.acquire():
-                            # Read the contents of the output_meta.yaml file
-                            with open(os.path.join(root, file), "r") as f:
-                                self.output_dicts[root] = yaml.safe_load(f)
+                # Scan the folder and its subfolders for new metadata journals.
+                # With an event bus, this is only a fallback for missed journals.
+                if (
+                    subscriber is None
+                    or time.time() - last_scan > FALLBACK_SCAN_INTERVAL
+                ):
+                    for metadata_file in find_metadata_files(self.folder):
+                        self.add_reader(metadata_file)
+                    changed_files.update(self.readers)
+                    last_scan = time.time()
+                # Only read the steps appended to journals with new steps
+                for metadata_file in changed_files:
+                    reader = self.readers[metadata_file]
+                    reader.update()
+                    if reader.has_header:
+                        self.output_dicts[metadata_file] = reader.metadata
                 for _, output_dict in self.output_dicts.items():
                     main_status.update("[bold white]Generating Data...")
                     # Check if the output_dict is valid
@@ -141,7 +157,16 @@ class ProgressTracker:
                                     )
                                 )
                             )
-                time.sleep(1)
+                changed_files = set()
+                if subscriber is None:
+                    time.sleep(1)
+                else:
+                    # Wake up as soon as a step was written
+                    for event in subscriber.wait(1):
+                        self.add_reader(event["path"])
+                        changed_files.add(os.path.abspath(event["path"]))
                 errors = self.check_errors()
                 if errors:
                     self.running = False
+        if subscriber is not None:
+            subscriber.close()
@@ -0,0 +1,197 @@
+"""Utility module for the local step event bus between Blender, postprocessing and the progress display."""
+
+import logging
+import os
+import queue
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import List, Union
+
+ADDRESS_ENV = "SYCLOPS_EVENT_BUS_ADDRESS"
+AUTHKEY_ENV = "SYCLOPS_EVENT_BUS_AUTHKEY"
+
+# Interval in seconds in which subscribers still scan the output folder
+# in case a publisher could not reach the event bus
+FALLBACK_SCAN_INTERVAL = 5.0
+
+
+class StepEventBroker(object):
+    """
+    Forward step events from publishers to all subscribers.
+
+    The broker listens on a local socket (a named pipe on Windows). Its address and
+    authentication key are exported as environment variables while the broker is running,
+    so child processes can connect to it. New subscribers first receive the latest event of
+    every output, which points them to its journal. The steps are read from the journals.
+    """
+
+    def __init__(self) -> None:
+        # Latest event per output id
+        self.history = {}
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.listener = None
+        self.closed = False
+
+    def __enter__(self) -> "StepEventBroker":
+        """Start listening and export the address of the event bus."""
+        authkey = os.urandom(16)
+        self.listener = Listener(authkey=authkey)
+        self._previous_env = {
+            key: os.environ.get(key) for key in (ADDRESS_ENV, AUTHKEY_ENV)
+        }
+        os.environ[ADDRESS_ENV] = self.listener.address
+        os.environ[AUTHKEY_ENV] = authkey.hex()
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Stop listening and restore the environment."""
+        for key, value in self._previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        self.closed = True
+        self.listener.close()
+        with self.lock:
+            for conn in self.subscribers:
+                conn.close()
+            self.subscribers = []
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # Listener was closed or the client failed to authenticate
+                if self.closed:
+                    return
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            role = conn.recv()
+            if role == "subscribe":
+                with self.lock:
+                    for event in self.history.values():
+                        conn.send(event)
+                    self.subscribers.append(conn)
+            elif role == "publish":
+                while True:
+                    self._forward(conn.recv())
+        except (OSError, EOFError):
+            conn.close()
+
+    def _forward(self, event: dict):
+        with self.lock:
+            self.history[event["id"]] = event
+            for conn in list(self.subscribers):
+                try:
+                    conn.send(event)
+                except (OSError, EOFError):
+                    self.subscribers.remove(conn)
+
+
+class StepEventSubscriber(object):
+    """
+    Receive step events of the event bus in a background thread.
+
+    Args:
+        address: Address of the event bus.
+        authkey: Authentication key of the event bus.
+    """
+
+    def __init__(self, address: str, authkey: bytes) -> None:
+        self.events = queue.Queue()
+        self.conn = Client(address, authkey=authkey)
+        self.conn.send("subscribe")
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    @classmethod
+    def from_environment(cls) -> Union["StepEventSubscriber", None]:
+        """
+        Connect to the event bus of the current job.
+
+        Returns:
+            Union[StepEventSubscriber, None]: The subscriber or None if no event bus is available.
+        """
+        address = os.environ.get(ADDRESS_ENV)
+        if not address:
+            return None
+        try:
+            return cls(address, bytes.fromhex(os.environ[AUTHKEY_ENV]))
+        except (OSError, EOFError, AuthenticationError, KeyError, ValueError) as e:
+            logging.warning(f"Could not connect to event bus, polling instead: {e}")
+            return None
+
+    def wait(self, timeout: float) -> List[dict]:
+        """
+        Wait for step events.
+
+        Args:
+            timeout: Maximum time to wait in seconds.
+
+        Returns:
+            List[dict]: All events that were received, empty if the timeout was reached.
+        """
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self) -> None:
+        """Disconnect from the event bus."""
+        self.conn.close()
+
+    def _receive(self):
+        try:
+            while True:
+                self.events.put(self.conn.recv())
+        except (OSError, EOFError):
+            # Event bus is gone, subscribers fall back to polling
+            pass
+
+
+_publisher = {"pid": None, "conn": None, "disabled": False}
+_publisher_lock = threading.Lock()
+
+
+def publish_step_event(output_id: str, step: int, path: str) -> None:
+    """
+    Publish that a step of an output was written.
+
+    Does nothing if the process was not started with an event bus or the event bus is
+    not reachable. In this case the subscribers find the step by polling.
+
+    Args:
+        output_id: ID of the output.
+        step: Step number.
+        path: Path to the metadata journal of the output.
+    """
+    address = os.environ.get(ADDRESS_ENV)
+    if not address:
+        return
+    with _publisher_lock:
+        # Connections can not be shared with forked child processes
+        if _publisher["pid"] != os.getpid():
+            _publisher.update(pid=os.getpid(), conn=None, disabled=False)
+        if _publisher["disabled"]:
+            return
+        try:
+            if _publisher["conn"] is None:
+                _publisher["conn"] = Client(
+                    address, authkey=bytes.fromhex(os.environ[AUTHKEY_ENV])
+                )
+                _publisher["conn"].send("publish")
+            _publisher["conn"].send({"id": output_id, "step": step, "path": path})
+        except (OSError, EOFError, AuthenticationError, KeyError, ValueError) as e:
+            logging.warning(f"Could not publish to event bus, disabling it: {e}")
+            _publisher.update(conn=None, disabled=True)
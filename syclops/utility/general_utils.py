@@ -1,14 +1,21 @@
 """Utility module for general functions."""
 
 import logging
+import os
 from pathlib import Path
 from typing import List
+import numpy as np
 import pkg_resources
 from filelock import FileLock, Timeout
 from ruamel import yaml
 import importlib.util
 import hashlib
 import struct
+import sys
+
+# Hash functions of the instance ids
+HASH_SCHEMES = ["sha256", "splitmix64"]
+DEFAULT_HASH_SCHEME = "sha256"
 
 def hash_vector(vector):
     # Convert the 3D vector into bytes
@@ -24,6 +31,69 @@ def hash_vector(vector):
     return hash_value
 
 
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    """Finalizer of the splitmix64 generator on uint64 arrays."""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def hash_vectors(vectors: np.ndarray, scheme: str = DEFAULT_HASH_SCHEME) -> np.ndarray:
+    """Hash quantized 3D vectors to signed 64-bit ids.
+
+    "sha256" hashes every vector with hash_vector in a Python loop. "splitmix64" mixes the integer
+    components with the splitmix64 finalizer, vectorized over all vectors.
+
+    Args:
+        vectors (np.ndarray): Array of shape (n, 3) with integer values, e.g. locations in mm.
+        scheme (str, optional): "sha256" or "splitmix64". Defaults to "sha256".
+
+    Returns:
+        np.ndarray: int64 ids of shape (n,)
+
+    Raises:
+        ValueError: If the scheme is not supported.
+    """
+    vectors = np.asarray(vectors).reshape(-1, 3)
+    if scheme == "sha256":
+        return np.fromiter(
+            (hash_vector(vector) for vector in vectors),
+            dtype=np.int64,
+            count=vectors.shape[0],
+        )
+    if scheme != "splitmix64":
+        raise ValueError(f"Unknown hash scheme {scheme}. Use one of {HASH_SCHEMES}")
+    lanes = vectors.astype(np.int64).view(np.uint64)
+    with np.errstate(over="ignore"):
+        hashes = _splitmix64(lanes[:, 0])
+        hashes = _splitmix64(hashes ^ lanes[:, 1])
+        hashes = _splitmix64(hashes ^ lanes[:, 2])
+    return hashes.view(np.int64)
+
+
+def get_rss() -> int:
+    """Resident memory of the current process.
+
+    Reads /proc on Linux. On other systems, the peak resident memory is returned.
+
+    Returns:
+        int: Resident memory in bytes, None if it can not be determined.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kB on other systems
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
 def create_folder(path: str) -> None:
     """
     Create a folder if it doesn't exist.
@@ -0,0 +1,300 @@
+"""Utility module for the append-only step journal of the outputs."""
+
+import json
+import logging
+import os
+from typing import List, Union
+
+from filelock import FileLock, Timeout
+from ruamel import yaml
+
+from .event_utils import publish_step_event
+
+JOURNAL_SUFFIX = "metadata.jsonl"
+YAML_SUFFIX = "metadata.yaml"
+
+# Last header written or read per journal file of this process
+_journal_headers = {}
+
+
+class StepJournalWriter(object):
+    """
+    Append step records to a JSON Lines metadata journal.
+
+    The journal starts with a header record containing the output description.
+    Every step is appended as a single line, so writing a step does not depend on
+    the number of steps already written. The header is only written again if it changed.
+    Written steps are published on the event bus of the job, if there is one.
+
+    Args:
+        filename: Path to the journal file.
+        timeout: Timeout for acquiring the lock.
+    """
+
+    def __init__(self, filename: str, timeout: int = 10) -> None:
+        """
+        Initialize the StepJournalWriter.
+
+        Args:
+            filename: Path to the journal file.
+            timeout: Timeout for acquiring the lock.
+        """
+        self.filename = filename
+        self.timeout = timeout
+
+    def add_step(self, step: int, step_dicts: List[dict]) -> None:
+        """
+        Add a step to the journal.
+
+        Args:
+            step: The step to add.
+            step_dicts: The step details.
+        """
+        self.data.setdefault("steps", {})[step] = step_dicts
+
+    def __enter__(self) -> "StepJournalWriter":
+        """
+        Enter the journal writer context, acquiring the file lock.
+
+        Returns:
+            self: Returns the instance of the writer.
+
+        Raises:
+            TimeoutError: If the lock could not be acquired.
+        """
+        self.lock = FileLock("{0}.lock".format(self.filename), timeout=self.timeout)
+
+        try:
+            self.lock.acquire()
+        except Timeout:
+            raise_str = "Could not acquire lock on {0}.".format(self.filename)
+            logging.error(raise_str)
+            raise TimeoutError(raise_str)
+
+        self.data = {}
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Exit the journal writer context, appending the records and releasing the lock.
+
+        Args:
+            exc_type: The type of the exception.
+            exc_value: The exception value.
+            traceback: The traceback.
+        """
+        try:
+            if exc_type is None:
+                self._append_records()
+        finally:
+            self.lock.release()
+
+    def _append_records(self) -> None:
+        steps = self.data.pop("steps", {})
+        lines = []
+        if self.filename not in _journal_headers:
+            _journal_headers[self.filename] = read_journal_header(self.filename)
+        header = {**_journal_headers[self.filename], **self.data}
+        if header != _journal_headers[self.filename]:
+            lines.append(json.dumps({"header": header}))
+            _journal_headers[self.filename] = header
+        for step, step_dicts in steps.items():
+            lines.append(json.dumps({"step": int(step), "entries": step_dicts}))
+        if lines:
+            with open(self.filename, "a") as journal_file:
+                journal_file.write("\n".join(lines) + "\n")
+        for step in steps:
+            publish_step_event(
+                header.get("id"), int(step), os.path.abspath(self.filename)
+            )
+
+
+class StepJournalReader(object):
+    """
+    Read a metadata journal incrementally.
+
+    Every call of update only parses the lines appended since the last call.
+    The metadata attribute has the same structure as the content of a metadata.yaml file.
+    A metadata.yaml file can be read as well, but it is re-read completely on every update.
+
+    Args:
+        filename: Path to the journal or YAML file.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.offset = 0
+        self.metadata = {"steps": {}}
+
+    @property
+    def has_header(self) -> bool:
+        """Whether the header record of the journal was read."""
+        return "id" in self.metadata
+
+    def update(self) -> List[int]:
+        """
+        Read the records appended since the last update.
+
+        Only complete lines are parsed, so a record that is currently being written
+        is read in the next update.
+
+        Returns:
+            List[int]: Steps that were added by this update.
+        """
+        if not self.filename.endswith(JOURNAL_SUFFIX):
+            return self._update_from_yaml()
+        try:
+            with open(self.filename, "rb") as journal_file:
+                journal_file.seek(self.offset)
+                chunk = journal_file.read()
+        except FileNotFoundError:
+            return []
+        end = chunk.rfind(b"\n") + 1
+        self.offset += end
+
+        new_steps = []
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                new_steps.extend(self._apply_record(json.loads(line)))
+        return new_steps
+
+    def _update_from_yaml(self) -> List[int]:
+        try:
+            metadata = read_metadata(self.filename)
+        except FileNotFoundError:
+            return []
+        if not metadata:
+            return []
+        steps = metadata.pop("steps", None) or {}
+        self.metadata.update(metadata)
+        new_steps = [step for step in steps if step not in self.metadata["steps"]]
+        self.metadata["steps"].update(steps)
+        return new_steps
+
+    def _apply_record(self, record: dict) -> List[int]:
+        if "header" in record:
+            self.metadata.update(record["header"])
+            return []
+        step = record["step"]
+        is_new = step not in self.metadata["steps"]
+        self.metadata["steps"][step] = record["entries"]
+        return [step] if is_new else []
+
+
+def write_journal_step(
+    filename: str, header: dict, step: int, step_dicts: List[dict]
+) -> None:
+    """
+    Append a single step to a metadata journal.
+
+    Args:
+        filename: Path to the journal file.
+        header: Output description, written if it changed.
+        step: The step to add.
+        step_dicts: The step details.
+    """
+    with StepJournalWriter(filename) as writer:
+        writer.data.update(header)
+        writer.add_step(step, step_dicts)
+
+
+def read_journal_header(filename: str) -> dict:
+    """
+    Read the merged header records of a metadata journal.
+
+    Args:
+        filename: Path to the journal file.
+
+    Returns:
+        dict: The header, empty if the journal does not exist yet.
+    """
+    header = {}
+    try:
+        with open(filename, "r") as journal_file:
+            for line in journal_file:
+                if line.startswith('{"header"') and line.endswith("\n"):
+                    header.update(json.loads(line)["header"])
+    except FileNotFoundError:
+        pass
+    return header
+
+
+def read_metadata(filename: str) -> Union[dict, None]:
+    """
+    Read the metadata of an output from a journal or a metadata.yaml file.
+
+    Args:
+        filename: Path to the journal or YAML file.
+
+    Returns:
+        Union[dict, None]: The metadata with the structure of a metadata.yaml file.
+    """
+    if filename.endswith(JOURNAL_SUFFIX):
+        reader = StepJournalReader(filename)
+        reader.update()
+        return reader.metadata
+    lock = FileLock(f"{filename}.lock")
+    with lock.acquire():
+        with open(filename, "r") as yaml_file:
+            return yaml.safe_load(yaml_file)
+
+
+def export_journal(filename: str) -> str:
+    """
+    Export a metadata journal to a metadata.yaml file next to it.
+
+    Args:
+        filename: Path to the journal file.
+
+    Returns:
+        str: Path to the YAML file.
+    """
+    yaml_filename = filename[: -len(JOURNAL_SUFFIX)] + YAML_SUFFIX
+    metadata = read_metadata(filename)
+    lock = FileLock(f"{yaml_filename}.lock")
+    with lock.acquire():
+        with open(yaml_filename, "w") as yaml_file:
+            yaml.safe_dump(metadata, yaml_file)
+    return yaml_filename
+
+
+def compact_journals(folder: str) -> List[str]:
+    """
+    Export all metadata journals in a folder and its subfolders to metadata.yaml files.
+
+    Args:
+        folder: Output folder of a job.
+
+    Returns:
+        List[str]: Paths to the YAML files.
+    """
+    yaml_files = []
+    for root, _, files in os.walk(folder):
+        for file in files:
+            if file.endswith(JOURNAL_SUFFIX):
+                yaml_files.append(export_journal(os.path.join(root, file)))
+    return yaml_files
+
+
+def find_metadata_files(folder: str) -> List[str]:
+    """
+    Find the metadata of all outputs in a folder and its subfolders.
+
+    Journals are preferred. A metadata.yaml file is only returned if there is no journal
+    next to it, e.g. for datasets that were generated before the journal was introduced.
+
+    Args:
+        folder: Output folder of a job.
+
+    Returns:
+        List[str]: Paths to the metadata files.
+    """
+    metadata_files = []
+    for root, _, files in os.walk(folder):
+        for file in files:
+            if file.endswith(JOURNAL_SUFFIX):
+                metadata_files.append(os.path.join(root, file))
+            elif file.endswith(YAML_SUFFIX):
+                journal = file[: -len(YAML_SUFFIX)] + JOURNAL_SUFFIX
+                if journal not in files:
+                    metadata_files.append(os.path.join(root, file))
+    return metadata_files
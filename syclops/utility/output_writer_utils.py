@@ -0,0 +1,251 @@
+"""Utility module for converting and writing sensor outputs in background processes."""
+
+import logging
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Union
+
+import numpy as np
+
+from .array_utils import DEFAULT_ARRAY_FORMAT, encode_array, save_array
+from .general_utils import DEFAULT_HASH_SCHEME, hash_vectors
+from .metadata_utils import write_journal_step
+
+DEFAULT_OUTPUT_WRITER_WORKERS = 0
+DEFAULT_MAX_BACKLOG = 4
+
+# Subfolder of the table that maps compact instance ids to the hashed instance ids
+INSTANCE_ID_TABLE = "instance_id_table"
+
+
+class AsyncOutputWriter(object):
+    """
+    Run output writing jobs in a process pool while Blender renders the next frame.
+
+    The number of submitted jobs that are not finished yet is bounded. If the backlog is
+    full, submit blocks until a job finished, so the memory of the queued images is capped.
+    The worker processes are spawned, so they do not inherit the state of Blender.
+
+    Args:
+        workers: Number of writer processes.
+        max_backlog: Maximum number of unfinished jobs.
+    """
+
+    def __init__(self, workers: int, max_backlog: int = DEFAULT_MAX_BACKLOG) -> None:
+        self.executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.max_backlog = max(1, max_backlog)
+        self.pending = set()
+
+    def submit(self, function: Callable, *args) -> None:
+        """
+        Submit a job, waiting for a free slot in the backlog.
+
+        Args:
+            function: Module level function to run in a worker process.
+            *args: Picklable arguments of the function.
+
+        Raises:
+            Exception: The exception of a failed job that finished in the meantime.
+        """
+        self._collect(block=False)
+        while len(self.pending) >= self.max_backlog:
+            self._collect(block=True)
+        self.pending.add(self.executor.submit(function, *args))
+
+    def drain(self) -> None:
+        """Wait for all submitted jobs and re-raise the first exception of a failed job."""
+        while self.pending:
+            self._collect(block=True)
+
+    def close(self) -> None:
+        """Wait for all submitted jobs and stop the worker processes."""
+        try:
+            self.drain()
+        finally:
+            # Jobs that did not start yet are dropped if a job failed
+            for future in self.pending:
+                future.cancel()
+            self.pending = set()
+            self.executor.shutdown()
+
+    def _collect(self, block: bool):
+        if block:
+            done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+        else:
+            done = {future for future in self.pending if future.done()}
+        for future in done:
+            self.pending.remove(future)
+            future.result()
+
+
+_output_writer = None
+
+
+def configure_output_writer(
+    workers: int = DEFAULT_OUTPUT_WRITER_WORKERS,
+    max_backlog: int = DEFAULT_MAX_BACKLOG,
+):
+    """Replace the output writer of this process.
+
+    Args:
+        workers (int, optional): Number of writer processes. 0 writes the outputs synchronously.
+        max_backlog (int, optional): Maximum number of outputs waiting to be written.
+    """
+    global _output_writer
+    close_output_writer()
+    if workers > 0:
+        _output_writer = AsyncOutputWriter(workers, max_backlog)
+
+
+def get_output_writer() -> Union[AsyncOutputWriter, None]:
+    """Return the output writer of this process or None if outputs are written synchronously."""
+    return _output_writer
+
+
+def close_output_writer():
+    """Wait for all outputs of the output writer to be written and stop it."""
+    global _output_writer
+    writer, _output_writer = _output_writer, None
+    if writer is not None:
+        writer.close()
+
+
+def write_array_output(
+    img: np.ndarray,
+    file: str,
+    conversion_function: Callable = None,
+    array_format: str = DEFAULT_ARRAY_FORMAT,
+    compression_level: int = None,
+    journal_step: tuple = None,
+) -> str:
+    """Convert a rendered image and save it as an array file.
+
+    Args:
+        img (np.ndarray): Rendered RGBA image.
+        file (str): Path to the rendered file. The array file is saved next to it.
+        conversion_function (Callable, optional): Function applied to the image. Defaults to None.
+        array_format (str, optional): Format of the array file. Defaults to "npz_compressed".
+        compression_level (int, optional): Level of the zstd or lz4 codec. Defaults to None.
+        journal_step (tuple, optional): Arguments of write_journal_step to record the
+            array file in the metadata after it was written. Defaults to None.
+
+    The conversion function can also return a tuple of the image and a dict of additional
+    arrays. Each additional array is saved in a subfolder named after its key.
+
+    Returns:
+        str: Path to the array file
+    """
+    # Remove alpha
+    img = img[:, :, :3]
+    # Check if channels have equal values
+    if np.all(img[:, :, 0] == img[:, :, 1]) and np.all(img[:, :, 0] == img[:, :, 2]):
+        img = img[:, :, 0]  # Convert to single channel
+
+    sidecars = {}
+    if conversion_function is not None:
+        img = conversion_function(img, file)
+        if isinstance(img, tuple):
+            img, sidecars = img
+    array_file = save_array(file, img, array_format, compression_level)
+    for name, sidecar in sidecars.items():
+        sidecar_file = Path(file).parent / name / Path(file).name
+        sidecar_file.parent.mkdir(exist_ok=True)
+        save_array(str(sidecar_file), sidecar, array_format, compression_level)
+    logging.info("Converted %s to numpy array", file)
+    if journal_step is not None:
+        write_journal_step(*journal_step)
+    return array_file
+
+
+def smallest_int_dtype(img: np.ndarray) -> np.dtype:
+    """Smallest integer dtype that holds all values of an integer array.
+
+    Args:
+        img (np.ndarray): Integer array.
+
+    Returns:
+        np.dtype: Unsigned dtype if there are no negative values, signed dtype otherwise.
+    """
+    if img.size == 0:
+        return np.dtype(np.uint8)
+    low, high = int(img.min()), int(img.max())
+    if low >= 0:
+        candidates = (np.uint8, np.uint16, np.uint32, np.uint64)
+    else:
+        candidates = (np.int8, np.int16, np.int32, np.int64)
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def convert_pixel_annotation(
+    img: np.ndarray,
+    file: str,
+    hash_scheme: str = DEFAULT_HASH_SCHEME,
+    compact: bool = False,
+    encoding: dict = None,
+    class_id_dtype: np.dtype = None,
+) -> Union[np.ndarray, tuple]:
+    """Convert a rendered pixel annotation pass to its output values.
+
+    With compact, the semantic segmentation is stored with class_id_dtype.
+    The instance segmentation is relabelled to sequential uint16 ids, or uint32 ids if there
+    are more than 65536 instances. The table mapping them to the hashed instance ids is
+    returned as additional array.
+
+    Args:
+        img (np.ndarray): Rendered pass without alpha channel.
+        file (str): Path to the rendered file, which contains the name of the pass.
+        hash_scheme (str, optional): Hash function of the instance ids. Defaults to "sha256".
+        compact (bool, optional): Store segmentation masks with compact dtypes. Defaults to False.
+        encoding (dict, optional): Quantized encoding of the metric values, see
+            create_encoding. Defaults to None.
+        class_id_dtype (np.dtype, optional): Dtype of compact semantic segmentations, which
+            should hold all class ids of the job. Defaults to the smallest dtype of the frame.
+
+    Returns:
+        Union[np.ndarray, tuple]: Converted pass, for compact instance segmentations
+            together with the id table
+    """
+    if "semantic_segmentation" in file:
+        img = np.round(img).astype(np.int32)
+        if compact:
+            if class_id_dtype is None:
+                class_id_dtype = smallest_int_dtype(img)
+            img = img.astype(class_id_dtype)
+
+    elif "instance_segmentation" in file:
+        try:
+            # Convert x, y, z to mm and round to integer
+            img_mm = np.round(img.astype(np.float64) * 1000)
+
+            # Calculate unique x, y, z values and assign new index
+            values, index = np.unique(img_mm.reshape(-1, img_mm.shape[2]), axis=0, return_inverse=True)
+
+            # Hash the unique values to get the instance id
+            instance_id = hash_vectors(values, hash_scheme)
+
+            # Create instance segmentation mask
+            if np.unique(instance_id).size != values.shape[0]:
+                logging.warning("Hashing of instance ids created collisions")
+            if compact:
+                dtype = np.uint16 if values.shape[0] <= 2**16 else np.uint32
+                img = index.reshape(img_mm.shape[0], img_mm.shape[1]).astype(dtype)
+                return img, {INSTANCE_ID_TABLE: instance_id}
+            img_mask = instance_id[index]
+            img = img_mask.reshape(img_mm.shape[0], img_mm.shape[1])
+        except IndexError:
+            logging.warning("Instance segmentation mask is empty")
+            if compact:
+                img = np.zeros(img.shape[:2], dtype=np.uint16)
+                return img, {INSTANCE_ID_TABLE: np.zeros(1, dtype=np.int64)}
+            img = np.zeros(img.shape[:2], dtype=np.int32)
+    elif "object_volume" in file:
+        # Truncate in float64 like the previous loader, the buffers are float32
+        img = np.trunc(img.astype(np.float64) * 10**3) / (10**3)
+    return encode_array(img, encoding)
@@ -1,9 +1,20 @@
+import glob
+import hashlib
 import os
+import tempfile
+import threading
+from collections import OrderedDict
 
+import numpy as np
 import ruamel.yaml as yaml
 from filelock import FileLock, Timeout
 import pkg_resources
 
+from .array_utils import load_array
+
+DEFAULT_ARRAY_CACHE_MB = 512
+SHARED_ARRAY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
 
 def crawl_output_meta(parent_dir: str) -> dict:
     "Craw through folders and subfolders to finde output_meta.yaml files."
@@ -58,3 +69,152 @@ def _load_plugins_pp():
         except ModuleNotFoundError:
             pass
     return plugins
+
+
+class ArrayCache(object):
+    """LRU cache of decoded arrays, keyed by file path and modification time.
+
+    Arrays are returned read-only, as they are shared between all postprocessors.
+    Uncompressed .npy files are memory-mapped instead of being cached.
+    In shared mode, decoded arrays are additionally stored as .npy files in shared memory
+    and memory-mapped, so that postprocessors in other processes do not decode them again.
+
+    Args:
+        max_mb (int): Budget of the cache in megabytes. 0 disables the cache.
+        shared_prefix (str, optional): Name prefix of the shared arrays. Disables sharing if None.
+    """
+
+    def __init__(self, max_mb: int = DEFAULT_ARRAY_CACHE_MB, shared_prefix: str = None):
+        self.max_bytes = max_mb * 1024**2
+        self.shared_prefix = shared_prefix
+        self.entries = OrderedDict()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._created_files = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str, key: str = "array") -> np.ndarray:
+        """Load an array from a .npz or .npy file, decoding it only if it is not cached.
+
+        Args:
+            path (str): Path to the file
+            key (str, optional): Name of the array in a .npz file. Defaults to "array".
+
+        Returns:
+            np.ndarray: Read-only array
+        """
+        if self.max_bytes <= 0 or path.endswith(".npy"):
+            return load_array(path, key)
+        stat = os.stat(path)
+        cache_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, key)
+        while True:
+            with self._lock:
+                if cache_key in self.entries:
+                    self.entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return self.entries[cache_key]
+                loading = self._loading.get(cache_key)
+                if loading is None:
+                    self._loading[cache_key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another thread is decoding the same array
+            loading.wait()
+        try:
+            array = self._load_uncached(path, key, cache_key)
+            array.flags.writeable = False
+            self._insert(cache_key, array)
+        finally:
+            with self._lock:
+                self._loading.pop(cache_key).set()
+        return array
+
+    def clear(self):
+        """Remove all arrays from the cache."""
+        with self._lock:
+            for cache_key in list(self.entries):
+                self._evict(cache_key)
+
+    def _load_uncached(self, path: str, key: str, cache_key: tuple) -> np.ndarray:
+        if self.shared_prefix is None:
+            return load_array(path, key)
+        digest = hashlib.sha1(repr(cache_key).encode()).hexdigest()
+        shared_path = os.path.join(
+            SHARED_ARRAY_DIR, f"{self.shared_prefix}_{digest}.npy"
+        )
+        try:
+            return np.load(shared_path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            pass
+        array = load_array(path, key)
+        # Write to a temporary file first, so other processes never map a partial array
+        tmp_path = f"{shared_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, shared_path)
+        except OSError:
+            # Shared memory is full, keep the array private to this process
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return array
+        self._created_files[cache_key] = shared_path
+        return np.load(shared_path, mmap_mode="r")
+
+    def _insert(self, cache_key: tuple, array: np.ndarray):
+        with self._lock:
+            if array.nbytes > self.max_bytes:
+                self._remove_shared_file(cache_key)
+                return
+            self.entries[cache_key] = array
+            self.num_bytes += array.nbytes
+            while self.num_bytes > self.max_bytes:
+                self._evict(next(iter(self.entries)))
+
+    def _evict(self, cache_key: tuple):
+        self.num_bytes -= self.entries.pop(cache_key).nbytes
+        # Arrays that are still in use stay mapped after their file is removed
+        self._remove_shared_file(cache_key)
+
+    def _remove_shared_file(self, cache_key: tuple):
+        shared_path = self._created_files.pop(cache_key, None)
+        if shared_path is not None:
+            try:
+                os.remove(shared_path)
+            except FileNotFoundError:
+                pass
+
+
+_array_cache = ArrayCache()
+
+
+def configure_array_cache(max_mb: int = DEFAULT_ARRAY_CACHE_MB, shared_prefix: str = None):
+    """Replace the array cache of this process.
+
+    Args:
+        max_mb (int, optional): Budget of the cache in megabytes. 0 disables the cache.
+        shared_prefix (str, optional): Name prefix of the shared arrays. Disables sharing if None.
+    """
+    global _array_cache
+    _array_cache.clear()
+    _array_cache = ArrayCache(max_mb, shared_prefix)
+
+
+def get_array_cache() -> ArrayCache:
+    """Return the array cache of this process, which is shared by all postprocessors in it."""
+    return _array_cache
+
+
+def remove_shared_arrays(shared_prefix: str):
+    """Remove the shared arrays with the given prefix, e.g. after the workers were terminated.
+
+    Args:
+        shared_prefix (str): Name prefix of the shared arrays
+    """
+    for shared_path in glob.glob(os.path.join(SHARED_ARRAY_DIR, f"{shared_prefix}_*")):
+        try:
+            os.remove(shared_path)
+        except FileNotFoundError:
+            pass
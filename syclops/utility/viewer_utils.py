@@ -7,6 +7,8 @@ import numpy as np
 import yaml
 from syclops.preprocessing.texture_processor import process_texture
 
+from .array_utils import load_array
+
 
 def _load_yaml(path):
     with open(path, "r") as f:
@@ -14,7 +16,7 @@ def _load_yaml(path):
 
 
 def read_image(img_path, cmap=cv2.COLORMAP_JET):
-    img = np.load(img_path)["array"]
+    img = load_array(img_path)
     img = ((img - img.min()) / (img.max() - img.min()) * 255).astype(np.uint8)
     return cv2.applyColorMap(img, cmap)
 
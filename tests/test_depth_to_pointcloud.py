@@ -0,0 +1,71 @@
+"""Unprojection of depth outputs against known camera projections."""
+
+import numpy as np
+from syclops.utility import depth_to_pointcloud
+
+WIDTH, HEIGHT = 64, 48
+
+
+def _camera_matrix(f_u=80.0, f_v=80.0, u_0=WIDTH / 2, v_0=HEIGHT / 2):
+    """Camera matrix like Camera.get_camera_matrix, v is counted from the top row."""
+    return np.array([[f_u, 0.0, u_0], [0.0, f_v, v_0], [0.0, 0.0, 1.0]])
+
+
+def _project(points, camera_matrix):
+    """Project points of the Blender camera frame (x right, y up, looking along -z)."""
+    x, y, z = points[..., 0], points[..., 1], -points[..., 2]
+    u = camera_matrix[0, 0] * x / z + camera_matrix[0, 2]
+    v = -camera_matrix[1, 1] * y / z + camera_matrix[1, 2]
+    return u, v
+
+
+def test_points_project_to_pixel_centers():
+    camera_matrix = _camera_matrix(f_u=90.0, f_v=75.0, u_0=30.0, v_0=26.0)
+    depth = np.random.default_rng(0).uniform(0.5, 20.0, (HEIGHT, WIDTH))
+    pointcloud = depth_to_pointcloud(depth, camera_matrix)
+    u, v = _project(pointcloud.astype(np.float64), camera_matrix)
+    rows, cols = np.mgrid[0:HEIGHT, 0:WIDTH]
+    np.testing.assert_allclose(u, cols + 0.5, atol=1e-3)
+    np.testing.assert_allclose(v, rows + 0.5, atol=1e-3)
+    np.testing.assert_allclose(-pointcloud[..., 2], depth, rtol=1e-6)
+
+
+def test_axis_orientation():
+    depth = np.full((HEIGHT, WIDTH), 2.0)
+    pointcloud = depth_to_pointcloud(depth, _camera_matrix())
+    # The top left pixel is left of and above the optical axis
+    np.testing.assert_allclose(
+        pointcloud[0, 0], [2.0 * -31.5 / 80.0, 2.0 * 23.5 / 80.0, -2.0], rtol=1e-6
+    )
+    # The bottom right pixel is right of and below the optical axis
+    np.testing.assert_allclose(
+        pointcloud[-1, -1], [2.0 * 31.5 / 80.0, 2.0 * -23.5 / 80.0, -2.0], rtol=1e-6
+    )
+
+
+def test_tilted_plane():
+    # Plane through (0, 0, -4) whose depth increases towards the bottom of the image
+    camera_matrix = _camera_matrix()
+    normal = np.array([0.0, -0.5, 1.0])
+    rows, cols = np.mgrid[0:HEIGHT, 0:WIDTH]
+    ray = np.stack(
+        [
+            (cols + 0.5 - camera_matrix[0, 2]) / camera_matrix[0, 0],
+            -(rows + 0.5 - camera_matrix[1, 2]) / camera_matrix[1, 1],
+            -np.ones(rows.shape),
+        ],
+        -1,
+    )
+    depth = (normal @ [0.0, 0.0, -4.0]) / (ray @ normal)
+    pointcloud = depth_to_pointcloud(depth, camera_matrix)
+    np.testing.assert_allclose(pointcloud @ normal, -4.0, rtol=1e-5)
+    assert depth[0, 0] < depth[-1, 0]
+
+
+def test_pixels_without_depth_are_zero():
+    depth = np.zeros((HEIGHT, WIDTH))
+    depth[10, 20] = 3.0
+    pointcloud = depth_to_pointcloud(depth, _camera_matrix())
+    assert pointcloud.dtype == np.float32
+    assert pointcloud.shape == (HEIGHT, WIDTH, 3)
+    assert np.count_nonzero(np.any(pointcloud != 0, axis=-1)) == 1
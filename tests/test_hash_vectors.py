@@ -0,0 +1,67 @@
+"""Collision rate and throughput of the instance id hash schemes."""
+
+import time
+
+import numpy as np
+from syclops.utility import hash_vectors
+
+
+def _grid(size: int, spacing: int = 1) -> np.ndarray:
+    """Locations in mm of a cubic grid centered around the origin."""
+    axis = (np.arange(size) - size // 2) * spacing
+    return np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), -1).reshape(-1, 3)
+
+
+def _collisions(ids: np.ndarray) -> int:
+    return ids.size - np.unique(ids).size
+
+
+def test_splitmix64_grid_has_no_collisions():
+    # 1M neighbouring locations, 1 mm apart
+    locations = _grid(100)
+    assert _collisions(hash_vectors(locations, "splitmix64")) == 0
+
+
+def test_splitmix64_random_locations_have_no_collisions():
+    # Distinct locations in mm within a 200 m cube
+    rng = np.random.default_rng(0)
+    locations = np.unique(rng.integers(-100000, 100000, (1000000, 3)), axis=0)
+    assert _collisions(hash_vectors(locations, "splitmix64")) == 0
+
+
+def test_sha256_grid_has_no_collisions():
+    locations = _grid(30, spacing=7)
+    assert _collisions(hash_vectors(locations, "sha256")) == 0
+
+
+def test_schemes_are_deterministic():
+    locations = _grid(10)
+    for scheme in ("sha256", "splitmix64"):
+        ids = hash_vectors(locations, scheme)
+        assert ids.dtype == np.int64
+        np.testing.assert_array_equal(ids, hash_vectors(locations.copy(), scheme))
+
+
+def benchmark_hash_schemes(num_vectors: int = 100000, repeats: int = 3) -> dict:
+    """Vectors per second of every hash scheme, the fastest of several runs."""
+    rng = np.random.default_rng(0)
+    locations = rng.integers(-100000, 100000, (num_vectors, 3))
+    throughput = {}
+    for scheme in ("sha256", "splitmix64"):
+        durations = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            hash_vectors(locations, scheme)
+            durations.append(time.perf_counter() - start)
+        throughput[scheme] = num_vectors / min(durations)
+    return throughput
+
+
+def test_splitmix64_is_faster_than_sha256():
+    throughput = benchmark_hash_schemes(num_vectors=20000)
+    assert throughput["splitmix64"] > 10 * throughput["sha256"]
+
+
+if __name__ == "__main__":
+    for scheme, vectors_per_s in benchmark_hash_schemes().items():
+        print(f"{scheme}: {vectors_per_s:,.0f} vectors/s")